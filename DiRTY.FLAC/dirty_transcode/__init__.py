@@ -0,0 +1,30 @@
+"""DiRTY Transcode as a library: album jobs, presets, progress events and cooperative cancellation.
+
+Importing the package loads nothing else; each name below pulls in its
+module on first use, and mutagen, numpy, torf and Pillow are only loaded
+by the stages that need them. See dirty_transcode.api for an example.
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    'AlbumJob': 'api',
+    'Preset': 'api',
+    'Transcoder': 'api',
+    'find_albums': 'api',
+    'presets': 'api',
+    'add_listener': 'events',
+    'remove_listener': 'events',
+    'cancel': 'events',
+    'cancelled': 'events',
+    'main': 'cli',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
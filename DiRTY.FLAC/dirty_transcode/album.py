@@ -0,0 +1,183 @@
+"""One album from source folder to verified, tagged, hashed outputs."""
+import re
+import itertools
+import shutil
+from pathlib import Path
+from concurrent.futures import wait
+
+from . import config
+from .art import forget_album_art
+from .checksums import queue_checksums, write_checksum_manifests
+from .deviceio import get_device_io
+from .encode import transcode_track
+from .events import cancelled, emit_event, stage_timer
+from .files import copy_images
+from .index import index_album
+from .lazy import np, torf
+from .manifest import build_album_manifest
+from .pipeline import get_scheduler
+from .replaygain import needs_replaygain, write_album_gain
+from .spectral import spectral_folder, write_album_spectral
+from .torrents import torrent_job
+from .verify import verify_album
+
+
+def convert_multi(flac_path, targets, jobs=config.JOBS, manifest=None, scheduler=None):
+    """Transcode an album to several presets, decoding each FLAC only once.
+
+    `targets` maps preset -> output folder. Returns preset -> album success.
+    Tags, STREAMINFO and art come from `manifest`, built here if not given.
+    Tracks go to the shared encode stage of `scheduler`, or of the
+    process-wide scheduler (CPU budget `jobs`) if none is given.
+    """
+    flac_path = Path(flac_path)
+    scheduler = scheduler or get_scheduler(jobs)
+    targets = {preset: Path(output_path) for preset, output_path in targets.items()}
+    for output_path in targets.values():
+        output_path.mkdir(parents=True, exist_ok=True)
+
+    if manifest is None:
+        manifest = build_album_manifest(flac_path)
+    if not manifest.tracks:
+        print(f"No FLAC files found in {flac_path}")
+        return dict.fromkeys(targets, False)
+
+    measure = needs_replaygain(manifest)
+    spectrals = spectral_folder(flac_path) if config.SPECTRALS and np is not None else None
+    finished = itertools.count(1)
+    device_io = get_device_io()
+    # Hint the tracks the encoders will reach next; remote workers read the sources themselves
+    ahead = 0 if scheduler.remote else scheduler.budget.slots + config.PREFETCH_TRACKS
+    for track in manifest.tracks[:ahead]:
+        device_io.prefetch(track.path)
+    upcoming = itertools.count(ahead)
+
+    def progress(track, results):
+        if ahead:
+            following = next(upcoming)
+            if following < len(manifest.tracks):
+                device_io.prefetch(manifest.tracks[following].path)
+        emit_event('track', album=flac_path.name, item=str(track.rel_path), results=results,
+                   done=next(finished), total=len(manifest.tracks))
+
+    def encoded(track, future):
+        if future.exception():
+            return
+        progress(track, future.result())
+        # Album gain rewrites the tags once every track is in, so measured albums are hashed after that
+        if config.CHECKSUMS and not measure:
+            queue_checksums(manifest, targets, track, future.result(), scheduler)
+
+    print(f"Queueing {len(manifest.tracks)} tracks for {', '.join(targets)} "
+          f"(CPU budget {scheduler.budget.slots})")
+    futures = [scheduler.encode(transcode_track, track, targets, manifest.art, measure, spectrals)
+               for track in manifest.tracks]
+    for track, future in zip(manifest.tracks, futures):
+        future.add_done_callback(lambda f, track=track: encoded(track, f))
+    track_results = [f.result() for f in futures]
+
+    if measure and not cancelled():
+        write_album_gain(manifest, targets, track_results)
+    if config.CHECKSUMS and measure:
+        for track, results in zip(manifest.tracks, track_results):
+            queue_checksums(manifest, targets, track, results, scheduler)
+    if spectrals:
+        write_album_spectral(manifest, spectrals)
+    return {preset: all(r[preset] for r in track_results) for preset in targets}
+
+
+def delete_source(flac_folder, index=None):
+    print(f"Deleting source folder: {flac_folder}")
+    with stage_timer('delete', album=flac_folder.name) as ev:
+        ev['bytes_in'] = (index or index_album(flac_folder)).total_size
+        shutil.rmtree(flac_folder)
+    return True
+
+
+# "24bit", "24-bit-96kHz", "24-96", "24/88.2", "192kHz": hi-res markers, matched as whole tokens
+HIRES_MARKER = re.compile(
+    r'(?<![\w.])(?:24[\s_-]*bits?(?:[\s_/-]*\d{2,3}(?:\.\d)?\s*k?hz)?'
+    r'|24\s*[-/]\s*\d{2,3}(?:\.\d)?(?:\s*k?hz)?'
+    r'|(?:88\.2|96|176\.4|192)\s*khz)(?![\w.])', re.IGNORECASE)
+
+
+def output_folder_name(folder_name, preset):
+    if preset in config.FLAC_PRESETS:
+        # Hi-res markers no longer describe the output; tidy the separators and brackets they leave behind
+        folder_name = HIRES_MARKER.sub('', folder_name)
+        folder_name = re.sub(r'(?<=[\[(])[\s,;/_-]+|[\s,;/_-]+(?=[\])])', '', folder_name)
+        folder_name = re.sub(r'\s*(?:\(\)|\[\])', '', folder_name)
+        folder_name = re.sub(r'(\s-|[,;/])(?:\s*(?:-|[,;/]))+(?=\s|$)', r'\1', folder_name)
+        folder_name = re.sub(r'\s+', ' ', folder_name).strip(' ,;/_-')
+    return re.sub(r'flac', config.PRESET_FOLDERS[preset], folder_name, flags=re.IGNORECASE)
+
+
+def process_album(flac_folder: Path, presets, del_src, create_torrent_flag, tracker_objs, jobs=config.JOBS,
+                  torrent_mode=config.TORRENT_MODE, scheduler=None):
+    """Encode and verify an album and copy its images, then queue hashing and deletion.
+
+    Only presets whose every output passed verification get torrents, and
+    the source is only deleted if all of them did. Returns once the album's
+    encodes, checks and copies are done; torrent hashing and the source
+    delete keep running on the scheduler's stages.
+    """
+    folder_name = flac_folder.name
+    scheduler = scheduler or get_scheduler(jobs)
+
+    if not presets:
+        print(f"Skipping: {folder_name}")
+        return
+    if cancelled():
+        print(f"Cancelled: {folder_name}")
+        return False
+
+    targets = {preset: config.OUTPUT_DIR / output_folder_name(folder_name, preset) for preset in presets}
+
+    manifest = build_album_manifest(flac_folder)
+    emit_event('album_start', album=folder_name, presets=presets, tracks=len(manifest.tracks))
+    print(f"Converting to {', '.join(config.PRESET_FOLDERS[p] for p in presets)}...")
+    results = convert_multi(flac_folder, targets, jobs, manifest, scheduler)
+    if cancelled():
+        # Finished tracks are in the journal; the next run picks the album up from there
+        forget_album_art(flac_folder)
+        print(f"Cancelled: {folder_name} (no verification, torrents or deletes)")
+        emit_event('album', album=folder_name, results=results, ok=False, cancelled=True)
+        return False
+    results = verify_album(manifest, targets, results, scheduler)
+    forget_album_art(flac_folder)
+    if config.CHECKSUMS:
+        write_checksum_manifests(manifest, targets, [p for p in presets if results[p]])
+    emit_event('album', album=folder_name, results=results, ok=all(results.values()))
+
+    if create_torrent_flag == 'y':
+        done = [p for p in presets if results[p]]
+        print(f"Copying images to {', '.join(done)} folder(s)...")
+        copies = [scheduler.io(copy_images, flac_folder, targets[p], manifest.index) for p in done]
+        wait(copies)
+        for preset in done:
+            scheduler.hash(torrent_job, targets[preset], tracker_objs, scheduler.hash_threads, torrent_mode)
+
+    if all(results.values()):
+        if del_src == 'y':
+            scheduler.io(delete_source, flac_folder, manifest.index)
+    elif del_src == 'y':
+        print(f"Keeping source {folder_name}: not every output passed verification")
+    return all(results.values())
+
+
+def find_flac_folders(input_dir=config.INPUT_DIR):
+    return sorted(p for p in input_dir.iterdir() if p.is_dir() and re.search(r'flac', p.name, re.IGNORECASE))
+
+
+def check_preset_deps(presets):
+    if any(p in config.FLAC_PRESETS for p in presets) and np is None:
+        print("Missing numpy (needed for FLAC 16-bit output). Install with: pip install numpy")
+        return False
+    return True
+
+
+def check_torrent_deps(create_torrent):
+    if create_torrent and torf is None:
+        print("Missing torf (needed for .torrent files). Install with: pip install torf")
+        return False
+    return True
@@ -0,0 +1,148 @@
+"""In-process API over the transcode pipeline.
+
+    from dirty_transcode import AlbumJob, Transcoder
+
+    with Transcoder(jobs=4, on_event=print) as transcoder:
+        future = transcoder.submit(AlbumJob('flac/Artist - Album (2020) [FLAC]', ['V0', '320']))
+        print(future.result())
+
+Settings not taken here (journal and cache locations, ReplayGain, art
+limits, ...) are the ones in dirty_transcode.config. They are
+process-wide, so run one Transcoder at a time. The ones a Transcoder
+overrides are put back when it is closed.
+"""
+import shutil
+from pathlib import Path
+from dataclasses import dataclass, field
+from concurrent.futures import wait
+
+from . import config
+from .album import check_preset_deps, find_flac_folders, output_folder_name, process_album
+from .daemon import profile_trackers
+from .events import add_listener, cancel, remove_listener, reset_cancel
+from .lazy import torf
+from .pipeline import get_scheduler, shutdown_scheduler
+
+
+@dataclass(frozen=True)
+class Preset:
+    """An output format: a LAME preset (V0, V2, 320) or a FLAC one (FLAC16)."""
+    name: str
+
+    def __post_init__(self):
+        if self.name not in config.PRESET_FOLDERS:
+            raise ValueError(f"Unknown preset {self.name!r}, expected one of {', '.join(config.PRESET_FOLDERS)}")
+
+    @property
+    def label(self):
+        """What replaces 'flac' in the output folder name, e.g. 'MP3 V0'."""
+        return config.PRESET_FOLDERS[self.name]
+
+    @property
+    def lossless(self):
+        return self.name in config.FLAC_PRESETS
+
+    def output_folder(self, source):
+        return config.OUTPUT_DIR / output_folder_name(Path(source).name, self.name)
+
+
+def presets():
+    return [Preset(name) for name in config.PRESET_FOLDERS]
+
+
+@dataclass
+class AlbumJob:
+    """One album folder and what to make from it."""
+    source: Path
+    presets: list
+    torrent: bool = False
+    trackers: object = field(default_factory=list)  # names from trackers.json, or 'all'
+    torrent_mode: str = config.TORRENT_MODE
+    delete_source: bool = False
+
+    def __post_init__(self):
+        self.source = Path(self.source)
+        self.presets = [p if isinstance(p, Preset) else Preset(p) for p in self.presets]
+        if self.torrent_mode not in config.TORRENT_MODES:
+            raise ValueError(f"Unknown torrent_mode {self.torrent_mode!r}")
+
+
+def find_albums(presets, input_dir=config.INPUT_DIR, **options):
+    """An AlbumJob for every folder in `input_dir` with 'flac' in its name."""
+    return [AlbumJob(folder, presets, **options) for folder in find_flac_folders(Path(input_dir))]
+
+
+# config settings __init__ may replace, restored by close()
+OVERRIDDEN = ('OUTPUT_DIR', 'TORRENT_DIR', 'JOURNAL_FILE', 'TRANSCODE_CACHE_DIR')
+
+
+class Transcoder:
+    """Runs AlbumJobs on the process-wide pipeline scheduler.
+
+    `on_event(record)` gets every event as the dict --events would write:
+    'album_start', 'track' (with done/total), 'album' (per-preset
+    results), 'stage', 'cancel', ... It is called from pipeline threads.
+    cancel() lets the encodes in progress finish and skips everything
+    still queued; cancelled albums are not verified, hashed or deleted.
+    """
+
+    def __init__(self, jobs=config.JOBS, output_dir=None, torrent_dir=None, journal=True, cache=True,
+                 on_event=None):
+        if shutil.which(config.FLAC_CMD) is None:
+            raise RuntimeError(f"{config.FLAC_CMD} is not on PATH")
+        self._settings = {name: getattr(config, name) for name in OVERRIDDEN}
+        if output_dir:
+            config.OUTPUT_DIR = Path(output_dir)
+        if torrent_dir:
+            config.TORRENT_DIR = Path(torrent_dir)
+        if not journal:
+            config.JOURNAL_FILE = None
+        if not cache:
+            config.TRANSCODE_CACHE_DIR = None
+        config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        reset_cancel()
+        self.jobs = jobs
+        self.on_event = on_event
+        if on_event:
+            add_listener(on_event)
+        self.scheduler = get_scheduler(jobs)
+
+    def submit(self, job):
+        """Queue `job`. The future's result is True once every preset's outputs passed verification."""
+        presets = [p.name for p in job.presets]
+        if not all(p.lossless for p in job.presets) and shutil.which(config.LAME_CMD) is None:
+            raise RuntimeError(f"MP3 presets need {config.LAME_CMD} on PATH")
+        if not check_preset_deps(presets):
+            raise RuntimeError("FLAC presets need numpy")
+        trackers = []
+        if job.torrent:
+            if torf is None:
+                raise RuntimeError("Torrents need torf")
+            config.TORRENT_DIR.mkdir(parents=True, exist_ok=True)
+            trackers = profile_trackers({'trackers': job.trackers})
+        return self.scheduler.album(process_album, job.source, presets, 'y' if job.delete_source else 'n',
+                                    'y' if job.torrent else 'n', trackers, self.jobs, job.torrent_mode,
+                                    self.scheduler)
+
+    def run(self, jobs):
+        """Run `jobs` and return their results in order."""
+        futures = [self.submit(job) for job in jobs]
+        wait(futures)
+        return [f.result() for f in futures]
+
+    def cancel(self):
+        cancel()
+
+    def close(self):
+        """Wait for everything queued, including torrent hashing and deletes, then stop the pipeline."""
+        shutdown_scheduler()
+        if self.on_event:
+            remove_listener(self.on_event)
+        for name, value in self._settings.items():
+            setattr(config, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,141 @@
+"""Album art: one image per album, cached by content and normalized once for embedding."""
+import io
+import hashlib
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+from . import config
+from .events import stage_timer
+from .index import index_album, natural_key
+from .lazy import Image
+
+# Album art shared by every preset and track: folder -> sha1 -> AlbumArt
+AlbumArt = namedtuple('AlbumArt', 'data mime digest source')
+_ART_BLOBS = {}
+_ALBUM_ART = {}
+_ART_LOCK = threading.Lock()
+
+_NORMALIZED_ART = {}       # original sha1 -> AlbumArt to embed
+
+
+def image_mime(data):
+    """Guess the MIME type of an image from its magic bytes."""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    return 'image/jpeg'
+
+
+def cache_album_art(flac_folder, data, mime, source):
+    """Store image bytes in the content-addressed art cache and bind them to the album."""
+    digest = hashlib.sha1(data).hexdigest()
+    with _ART_LOCK:
+        art = _ART_BLOBS.get(digest)
+        if art is None:
+            art = AlbumArt(data, mime, digest, source)
+            _ART_BLOBS[digest] = art
+        _ALBUM_ART[Path(flac_folder).resolve()] = digest
+    return art
+
+
+def forget_album_art(flac_folder):
+    """Drop an album's cached art once no preset or track needs it any more."""
+    with _ART_LOCK:
+        digest = _ALBUM_ART.pop(Path(flac_folder).resolve(), None)
+        if digest and digest not in _ALBUM_ART.values():
+            _ART_BLOBS.pop(digest, None)
+            _NORMALIZED_ART.pop(digest, None)
+
+
+def normalize_album_art(art):
+    """The version of `art` to embed under the ART_* policy, computed once per image and cached."""
+    if art is None or not config.ART_NORMALIZE:
+        return art
+    with _ART_LOCK:
+        normalized = _NORMALIZED_ART.get(art.digest)
+    if normalized:
+        return normalized
+    with stage_timer('art_normalize', source=str(art.source), bytes_in=len(art.data)) as ev:
+        normalized = _normalize_art(art)
+        ev['bytes_out'] = len(normalized.data)
+    with _ART_LOCK:
+        _NORMALIZED_ART[art.digest] = normalized
+    return normalized
+
+
+def _normalize_art(art):
+    if Image is None:
+        if len(art.data) > config.ART_MAX_BYTES:
+            print(f"Pillow is not installed; embedding the {len(art.data)} byte cover as is")
+        return art
+    try:
+        with Image.open(io.BytesIO(art.data)) as img:
+            size = img.size
+            if max(size) <= config.ART_MAX_SIZE and len(art.data) <= config.ART_MAX_BYTES:
+                return art
+            if img.mode not in ('RGB', 'L'):
+                # Flatten transparency onto white; JPEG has no alpha
+                rgba = img.convert('RGBA')
+                img = Image.new('RGB', rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel('A'))
+            else:
+                img = img.copy()
+        img.thumbnail((config.ART_MAX_SIZE, config.ART_MAX_SIZE), Image.LANCZOS)
+        quality = config.ART_JPEG_QUALITY
+        while True:
+            buf = io.BytesIO()
+            img.save(buf, 'JPEG', quality=quality, optimize=True)
+            data = buf.getvalue()
+            if len(data) <= config.ART_MAX_BYTES or quality <= config.ART_MIN_JPEG_QUALITY:
+                break
+            quality = max(config.ART_MIN_JPEG_QUALITY, quality - 10)
+    except Exception as e:
+        print(f"Could not normalize cover art from {art.source}: {e}")
+        return art
+    if len(data) >= len(art.data):
+        return art
+    print(f"Cover art for embedding: {size[0]}x{size[1]}, {len(art.data)} bytes -> "
+          f"{img.size[0]}x{img.size[1]} JPEG q{quality}, {len(data)} bytes")
+    return AlbumArt(data, 'image/jpeg', hashlib.sha1(data).hexdigest(), art.source)
+
+
+def embedded_cover(pictures):
+    """Return (data, mime) of the front cover (or first picture) among FLAC pictures, or None."""
+    from mutagen.id3 import PictureType
+    if not pictures:
+        return None
+    picture = next((p for p in pictures if p.type == PictureType.COVER_FRONT), pictures[0])
+    if not picture.data:
+        return None
+    return picture.data, picture.mime or image_mime(picture.data)
+
+
+def get_cached_album_art(flac_folder):
+    with _ART_LOCK:
+        digest = _ALBUM_ART.get(Path(flac_folder).resolve())
+        return _ART_BLOBS[digest] if digest else None
+
+
+def get_album_image(flac_folder, index=None):
+    """Find a single album image: the embedded cover read_track cached, else a folder image.
+
+    The image is kept in memory and cached per album, so every preset and
+    track shares the same bytes. Nothing is written to the source folder.
+    """
+    flac_folder = Path(flac_folder)
+    art = get_cached_album_art(flac_folder)
+    if art:
+        return art
+
+    index = index or index_album(flac_folder)
+    # Otherwise a folder image, preferring the album folder over disc folders and the usual cover names
+    image_files = [f.path for f in sorted(index.images, key=lambda f: (
+        len(f.rel_path.parts), f.path.stem.lower() not in config.COVER_NAMES, natural_key(f.rel_path)))]
+    for image_file in image_files:
+        data = image_file.read_bytes()
+        if data:
+            print(f"Using folder image: {image_file} ({len(data)} bytes)")
+            return cache_album_art(flac_folder, data, image_mime(data), image_file)
+
+    print(f"No image found in {flac_folder} or embedded in FLAC files")
+    return None
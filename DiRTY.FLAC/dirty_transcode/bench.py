@@ -0,0 +1,172 @@
+"""--benchmark: the real pipeline over a seeded synthetic corpus."""
+import os
+import json
+import time
+import shutil
+import platform
+import subprocess
+from pathlib import Path
+
+from . import config
+from .album import process_album
+from .events import print_stage_summary, reset_stage_stats, stage_summary
+from .index import index_album
+from .lazy import np, torf
+from .pipeline import PipelineScheduler
+from .spectral import png_bytes
+
+
+def synth_cover(size, seed):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = rng.random(3)
+    rgb = np.stack([(base[c] + x * (c + 1) + y * (3 - c)) % 1.0 for c in range(3)], axis=-1)
+    return png_bytes((rgb * 255).astype(np.uint8))
+
+
+def synth_pcm(bits, rate, seconds, seed):
+    """Deterministic stereo tone + noise, as little-endian signed PCM bytes."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * seconds)) / rate
+    freqs = rng.uniform(80, 4000, size=3)
+    left = sum(np.sin(2 * np.pi * f * t + rng.uniform(0, np.pi)) for f in freqs) / 4
+    right = np.sin(2 * np.pi * freqs[0] * 1.5 * t) / 4
+    audio = np.stack([left, right], axis=1) + rng.normal(0, 0.01, size=(len(t), 2))
+    peak = (1 << (bits - 1)) - 1
+    samples = np.clip(np.rint(audio * peak), -peak - 1, peak).astype('<i4')
+    if bits == 16:
+        return samples.astype('<i2').tobytes()
+    return samples.view(np.uint8).reshape(-1, 4)[:, :bits // 8].tobytes()
+
+
+def generate_bench_corpus(corpus_dir):
+    """Create (or reuse) the synthetic FLAC albums described by BENCH_ALBUMS."""
+    from mutagen.flac import FLAC, Picture
+    from mutagen.id3 import PictureType
+    spec_file = corpus_dir / 'corpus.json'
+    spec = {'seed': config.BENCH_SEED, 'albums': config.BENCH_ALBUMS}
+    albums = [corpus_dir / a['name'] for a in config.BENCH_ALBUMS]
+    if spec_file.exists() and json.loads(spec_file.read_text()) == spec and all(a.is_dir() for a in albums):
+        print(f"Reusing benchmark corpus in {corpus_dir}")
+        return albums
+
+    if corpus_dir.exists():
+        shutil.rmtree(corpus_dir)
+    for n, (album, album_dir) in enumerate(zip(config.BENCH_ALBUMS, albums)):
+        album_dir.mkdir(parents=True)
+        print(f"Generating benchmark album: {album['name']}")
+        cover = synth_cover(1000, config.BENCH_SEED + n)
+        if album['folder_art']:
+            (album_dir / 'cover.png').write_bytes(cover)
+        for track_no in range(1, album['tracks'] + 1):
+            flac_file = album_dir / f"{track_no:02d} - Track {track_no}.flac"
+            pcm = synth_pcm(album['bits'], album['rate'], album['seconds'], config.BENCH_SEED + 100 * n + track_no)
+            cmd = [config.FLAC_CMD, '--silent', '--force-raw-format', '--endian=little', '--sign=signed',
+                   '--channels=2', f"--bps={album['bits']}", f"--sample-rate={album['rate']}",
+                   '-5', '-f', '-o', str(flac_file), '-']
+            subprocess.run(cmd, input=pcm, check=True)
+
+            audio = FLAC(flac_file)
+            audio.update({
+                'TITLE': f"Track {track_no}", 'ARTIST': 'Bench Artist', 'ALBUMARTIST': 'Bench Artist',
+                'ALBUM': album['name'].split(' - ', 1)[1].split(' (')[0], 'DATE': '2024', 'GENRE': 'Test',
+                'TRACKNUMBER': str(track_no), 'DISCNUMBER': '1', 'ISRC': f"XX0002400{n}{track_no:03d}",
+                'COMMENT': 'DiRTY.FLAC benchmark corpus', 'PUBLISHER': 'Bench Records',
+            })
+            if album['embedded_art']:
+                picture = Picture()
+                picture.type = PictureType.COVER_FRONT
+                picture.mime = 'image/png'
+                picture.data = cover
+                audio.add_picture(picture)
+            audio.save()
+    spec_file.write_text(json.dumps(spec, indent=2))
+    return albums
+
+
+def tool_version(cmd):
+    try:
+        out = subprocess.run([cmd, '--version'], capture_output=True, text=True).stdout
+        return out.splitlines()[0].strip() if out else None
+    except OSError:
+        return None
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(jobs=config.JOBS, presets=None, report_file=None):
+    """Run the real pipeline over the synthetic corpus and report throughput and per-stage times as JSON."""
+    presets = presets or (['V0', '320', 'FLAC16'] if np is not None else ['V0', '320'])
+    if np is None:
+        print("Missing numpy (needed to generate the benchmark corpus). Install with: pip install numpy")
+        return None
+
+    albums = generate_bench_corpus(config.BENCH_DIR / 'corpus')
+    saved = config.OUTPUT_DIR, config.TORRENT_DIR, config.JOURNAL_FILE, config.TRANSCODE_CACHE_DIR
+    try:
+        config.OUTPUT_DIR = config.BENCH_DIR / 'out'
+        config.TORRENT_DIR = config.BENCH_DIR / 'torrents'
+        # Every run must really encode
+        config.JOURNAL_FILE = None
+        config.TRANSCODE_CACHE_DIR = None
+        for folder in (config.OUTPUT_DIR, config.TORRENT_DIR):
+            if folder.exists():
+                shutil.rmtree(folder)
+            folder.mkdir(parents=True)
+
+        tracks = [f.path for album in albums for f in index_album(album).flac]
+        bytes_in = sum(f.stat().st_size for f in tracks)
+        create_torrent_flag = 'y' if torf is not None else 'n'
+
+        import resource
+        reset_stage_stats()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        scheduler = PipelineScheduler(jobs)
+        for album in albums:
+            scheduler.album(process_album, album, presets, 'n', create_torrent_flag, [], jobs, config.TORRENT_MODE, scheduler)
+        ok = scheduler.wait()
+        scheduler.shutdown()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        child_cpu = (children_after.ru_utime - children.ru_utime) + (children_after.ru_stime - children.ru_stime)
+
+        bytes_out = sum(f.stat().st_size for f in config.OUTPUT_DIR.rglob('*') if f.is_file())
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                        'cpus': os.cpu_count(), 'flac': tool_version(config.FLAC_CMD), 'lame': tool_version(config.LAME_CMD)},
+            'config': {'jobs': jobs, 'presets': presets, 'torrents': create_torrent_flag == 'y', 'spectrals': config.SPECTRALS,
+                       'seed': config.BENCH_SEED, 'albums': config.BENCH_ALBUMS},
+            'ok': ok,
+            'tracks': len(tracks),
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'wall': round(wall, 3),
+            'cpu': round(cpu, 3),
+            'encoder_cpu': round(child_cpu, 3),
+            'tracks_per_sec': round(len(tracks) / wall, 3) if wall else None,
+            'mb_per_sec': round(bytes_in / 1e6 / wall, 3) if wall else None,
+            # stage cpu is in-process thread time; flac/lame subprocess time is in child_cpu / encoder_cpu
+            'stages': stage_summary(),
+        }
+
+        report_file = Path(report_file) if report_file else config.BENCH_DIR / f"report-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        report_file.write_text(json.dumps(report, indent=2))
+        print(json.dumps(report, indent=2))
+        print_stage_summary(wall)
+        print(f"Benchmark report written to {report_file}")
+        return report
+    finally:
+        config.OUTPUT_DIR, config.TORRENT_DIR, config.JOURNAL_FILE, config.TRANSCODE_CACHE_DIR = saved
@@ -0,0 +1,164 @@
+"""Content-addressed cache of untagged encoder output."""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+from . import config
+from .events import emit_event, stage_timer
+from .files import place_file
+from .journal import TranscodeJournal, preset_encoder, preset_key
+
+
+class TranscodeCache:
+    """Untagged encoder output on disk, indexed in SQLite, evicted least recently used first.
+
+    Entries are keyed by the FLAC's audio MD5, the preset's encoder args and
+    the encoder version, so the same audio under a different folder name,
+    edition or tagging is restored instead of re-encoded. Files are placed
+    by reflink or copy, never hardlinked, since tagging rewrites outputs.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0, 'bytes_restored': 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / 'index.sqlite3'), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            md5 TEXT NOT NULL,
+            preset TEXT NOT NULL,
+            encoder TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL)""")
+        # The cap may have been lowered since the last run
+        self._evict()
+
+    @staticmethod
+    def _key(md5, preset):
+        encoder = preset_encoder(preset)
+        return hashlib.sha1(f"{md5}\0{preset_key(preset)}\0{encoder}".encode()).hexdigest(), encoder
+
+    def _path(self, key):
+        return self.root / key[:2] / key
+
+    def restore(self, md5, preset, out_file):
+        """Place the cached encode for (md5, preset) at `out_file`; False on a miss."""
+        if not TranscodeJournal.usable(md5):
+            return False
+        key, _ = self._key(md5, preset)
+        with self._lock:
+            row = self._db.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+        path = self._path(key)
+        if row:
+            with stage_timer('cache_restore', item=out_file.name, preset=preset) as ev:
+                try:
+                    if path.stat().st_size != row[0]:
+                        raise FileNotFoundError(path)
+                    place_file(path, out_file, hardlink=False)
+                    hit = True
+                except OSError:
+                    hit = False
+                ev.update(ok=hit, bytes_out=row[0] if hit else 0)
+        with self._lock:
+            if row and hit:
+                self._db.execute("UPDATE entries SET last_used=? WHERE key=?", (time.time(), key))
+                self.stats['hits'] += 1
+                self.stats['bytes_restored'] += row[0]
+                return True
+            if row:
+                self._db.execute("DELETE FROM entries WHERE key=?", (key,))
+            self.stats['misses'] += 1
+        return False
+
+    def store(self, md5, preset, out_file):
+        """Add a freshly encoded, not yet tagged output, then evict down to the size cap."""
+        if not TranscodeJournal.usable(md5):
+            return
+        size = out_file.stat().st_size
+        if size > self.max_bytes:
+            return
+        key, encoder = self._key(md5, preset)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        try:
+            place_file(out_file, tmp, hardlink=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not cache {out_file}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, md5, preset, encoder, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, md5, preset_key(preset), encoder, size, time.time()))
+            self.stats['stored'] += 1
+        self._evict()
+
+    def discard(self, md5, preset):
+        """Drop the entry for (md5, preset), e.g. after an output restored or stored from it failed verification."""
+        key, _ = self._key(md5, preset)
+        with self._lock:
+            dropped = self._db.execute("DELETE FROM entries WHERE key=?", (key,)).rowcount
+        self._path(key).unlink(missing_ok=True)
+        return bool(dropped)
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            victims = []
+            if total > self.max_bytes:
+                for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append(key)
+                    total -= size
+                self._db.executemany("DELETE FROM entries WHERE key=?", [(key,) for key in victims])
+                self.stats['evicted'] += len(victims)
+        for key in victims:
+            self._path(key).unlink(missing_ok=True)
+
+    def usage(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def report(self):
+        entries, size = self.usage()
+        stats = self.stats
+        lookups = stats['hits'] + stats['misses']
+        rate = f" ({stats['hits'] / lookups:.0%} hit rate)" if lookups else ''
+        print(f"\nTranscode cache: {stats['hits']} hits, {stats['misses']} misses{rate}, "
+              f"{stats['stored']} stored, {stats['evicted']} evicted; "
+              f"{entries} entries, {size / 2**30:.2f} of {self.max_bytes / 2**30:.2f} GiB")
+        emit_event('cache', entries=entries, size=size, max_bytes=self.max_bytes, **stats)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache():
+    """Shared transcode cache, opened on first use; None when caching is disabled."""
+    global _CACHE
+    if config.TRANSCODE_CACHE_DIR is None or config.TRANSCODE_CACHE_MAX_BYTES <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = TranscodeCache(config.TRANSCODE_CACHE_DIR, config.TRANSCODE_CACHE_MAX_BYTES)
+        return _CACHE
+
+
+def report_cache():
+    """Print the shared cache's counters, if this run opened it."""
+    if _CACHE:
+        _CACHE.report()
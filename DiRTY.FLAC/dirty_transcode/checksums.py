@@ -0,0 +1,73 @@
+""".md5, .sfv and .ffp checksum manifests."""
+import os
+import mmap
+import hashlib
+import zlib
+from pathlib import Path
+
+from . import config
+from .deviceio import get_device_io
+from .events import stage_timer
+from .manifest import output_file
+
+
+def file_checksums(path):
+    """(MD5 hex, CRC32) of a file in one pass over a read-only memory map."""
+    md5, crc = hashlib.md5(), 0
+    with get_device_io().reading(path), stage_timer('checksum', item=Path(path).name) as ev, \
+            open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        ev['bytes_in'] = size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                data.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(data) as view:
+                    for pos in range(0, size, config.CHECKSUM_CHUNK):
+                        with view[pos:pos + config.CHECKSUM_CHUNK] as chunk:
+                            md5.update(chunk)
+                            crc = zlib.crc32(chunk, crc)
+    return md5.hexdigest(), crc
+
+
+def queue_checksums(manifest, targets, track, results, scheduler):
+    """Start hashing a finished track's outputs while the rest of the album encodes."""
+    for preset, ok in results.items():
+        if ok:
+            out_file = output_file(targets[preset], track, preset)
+            manifest.checksums.setdefault(preset, {})[track.rel_path] = scheduler.checksum(file_checksums, out_file)
+
+
+def write_lines(path, lines):
+    with open(path, 'w', newline='\n') as f:
+        f.writelines(line + '\n' for line in lines)
+
+
+def write_checksum_manifests(manifest, targets, presets):
+    """Write .md5/.sfv (and .ffp for FLAC presets) into each output folder, and the source's .ffp.
+
+    Uses the hashes queued as tracks finished; any output without one is
+    hashed here.
+    """
+    from mutagen.flac import FLAC
+    for preset in presets:
+        folder = targets[preset]
+        hashed = manifest.checksums.get(preset, {})
+        md5_lines, sfv_lines, ffp_lines = [], [], []
+        for track in manifest.tracks:
+            out_file = output_file(folder, track, preset)
+            name = out_file.relative_to(folder).as_posix()
+            future = hashed.get(track.rel_path)
+            md5, crc = future.result() if future else file_checksums(out_file)
+            md5_lines.append(f"{md5}  {name}")
+            sfv_lines.append(f"{name} {crc:08X}")
+            if preset in config.FLAC_PRESETS:
+                ffp_lines.append(f"{name}:{FLAC(out_file).info.md5_signature:032x}")
+        write_lines(folder / f"{folder.name}.md5", md5_lines)
+        write_lines(folder / f"{folder.name}.sfv", sfv_lines)
+        if ffp_lines:
+            write_lines(folder / f"{folder.name}.ffp", ffp_lines)
+
+    # Source fingerprints come straight from the STREAMINFO read into the manifest, no decode
+    ffp_file = config.OUTPUT_DIR / f"{manifest.folder.name}.ffp"
+    write_lines(ffp_file, [f"{t.rel_path.as_posix()}:{t.md5.lower()}" for t in manifest.tracks if t.md5])
+    print(f"Checksum manifests written for {', '.join(presets) or 'no outputs'}; source fingerprints in {ffp_file}")
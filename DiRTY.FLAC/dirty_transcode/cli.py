@@ -0,0 +1,229 @@
+"""The interactive command line."""
+import sys
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+from . import config
+from .album import check_preset_deps, check_torrent_deps, find_flac_folders, process_album
+from .bench import run_benchmark
+from .cache import report_cache
+from .daemon import run_daemon
+from .events import (cancel, close_event_log, emit_event, enable_profiling, open_event_log, print_stage_summary,
+                     stage_timer, write_profile)
+from .governor import parse_cpu_list, parse_ionice
+from .lazy import np
+from .pipeline import current_scheduler, get_scheduler
+from .remote import RemoteEncoder, parse_address, run_worker
+from .trackers import select_trackers
+
+
+def prompt_conversion_choice(folder_name):
+    print(f"\nAlbum: {folder_name}")
+    print("Transcoding format:")
+    for key, (label, _) in config.CONVERSION_CHOICES.items():
+        print(f" {key}. {label}")
+    while True:
+        choice = input(f"Enter choice [1-{len(config.CONVERSION_CHOICES)}]: ").strip()
+        if choice in config.CONVERSION_CHOICES:
+            break
+        print(f"Invalid, please enter {', '.join(config.CONVERSION_CHOICES)}")
+
+    create_torrent = 'n'
+    tracker_objs = []
+    if config.CONVERSION_CHOICES[choice][1]:
+        while True:
+            create_torrent = input("Do you want to create a .torrent? (y/n): ").lower()
+            if create_torrent in ('y', 'n'):
+                break
+            print("Please enter y or n")
+        if create_torrent == 'y':
+            tracker_objs = select_trackers()
+
+        while True:
+            del_src = input("Do you want to delete the flac after transcoding? (y/n): ").lower()
+            if del_src in ('y', 'n'):
+                break
+            print("Please enter y or n")
+    else:
+        del_src = 'n'
+
+    return choice, del_src, create_torrent, tracker_objs
+
+
+def check_tools():
+    if shutil.which(config.FLAC_CMD) is None:
+        print(f"Missing {config.FLAC_CMD}. Install with: sudo apt install flac")
+        return False
+    if shutil.which(config.LAME_CMD) is None:
+        print(f"Missing {config.LAME_CMD}. Install with: sudo apt install lame")
+        return False
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Transcode FLAC albums to MP3 and create torrents.")
+    parser.add_argument('-j', '--jobs', type=int, default=config.JOBS,
+                        help=f"number of tracks to transcode in parallel (default: {config.JOBS})")
+    parser.add_argument('--torrent-mode', choices=config.TORRENT_MODES, default=config.TORRENT_MODE,
+                        help="one torrent for all selected trackers, or one per tracker from a single hash "
+                             f"(default: {config.TORRENT_MODE})")
+    parser.add_argument('--no-journal', action='store_true',
+                        help=f"don't record or skip finished tracks in {config.JOURNAL_FILE}")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"don't restore or store encodes in {config.TRANSCODE_CACHE_DIR}")
+    parser.add_argument('--cache-size', type=float, default=config.TRANSCODE_CACHE_MAX_BYTES / 2**30, metavar='GIB',
+                        help=f"transcode cache size cap in GiB (default: {config.TRANSCODE_CACHE_MAX_BYTES / 2**30:g})")
+    parser.add_argument('--no-replaygain', action='store_true',
+                        help="only copy existing REPLAYGAIN_* tags; don't measure albums that lack them")
+    parser.add_argument('--original-art', action='store_true',
+                        help=f"embed cover art as found instead of downscaling it to {config.ART_MAX_SIZE}px / "
+                             f"{config.ART_MAX_BYTES // 1024} KiB")
+    parser.add_argument('--spectrals', action='store_true',
+                        help="check for lossy sources while encoding and save spectrograms to '<album> (Spectrals)'")
+    parser.add_argument('--checksums', action='store_true',
+                        help="write .md5/.sfv manifests (and .ffp for FLAC) for every output folder and the source")
+    parser.add_argument('--hdd-readers', type=int, default=config.HDD_READERS, metavar='N',
+                        help=f"concurrent readers per spinning disk (default: {config.HDD_READERS}; 0 for no cap)")
+    parser.add_argument('--nice', type=int, default=config.PIPELINE_NICE, metavar='N',
+                        help=f"niceness of the pipeline threads and encoders (default: {config.PIPELINE_NICE})")
+    parser.add_argument('--ionice', type=parse_ionice, default=config.PIPELINE_IONICE, metavar='CLASS[:LEVEL]',
+                        help="I/O priority of the pipeline: idle, best-effort[:0-7] or realtime[:0-7] "
+                             "(default: best-effort:7)")
+    parser.add_argument('--cpus', type=parse_cpu_list, default=config.CPU_AFFINITY, metavar='LIST',
+                        help="pin the pipeline to these CPUs, e.g. 2-5,7")
+    parser.add_argument('--max-load', type=float, default=config.MAX_LOAD, metavar='LOAD',
+                        help="drop CPU slots while the 1-minute load average is above LOAD, add them back below it")
+    parser.add_argument('--cpu-target', type=float, default=config.CPU_TARGET, metavar='PCT',
+                        help="like --max-load, but keeps system-wide CPU use around PCT percent")
+    parser.add_argument('--benchmark', action='store_true',
+                        help=f"transcode a synthetic corpus in {config.BENCH_DIR} and write a JSON timing report")
+    parser.add_argument('--bench-presets', type=lambda v: v.split(','), default=None,
+                        help="comma-separated presets for --benchmark (default: V0,320,FLAC16)")
+    parser.add_argument('--bench-report', type=Path, default=None,
+                        help="where --benchmark writes its JSON report (default: bench/report-<time>.json)")
+    parser.add_argument('--watch', action='store_true',
+                        help=f"run unattended: watch {config.INPUT_DIR} and process albums using {config.DAEMON_PROFILE_FILE}")
+    parser.add_argument('--coordinator', metavar='[HOST:]PORT', default=None,
+                        help="listen here and hand track encodes to --worker processes instead of encoding locally; "
+                             "a bare PORT listens on 127.0.0.1 only")
+    parser.add_argument('--worker', metavar='HOST:PORT', default=None,
+                        help="encode tracks for the coordinator at HOST:PORT with --jobs slots, then exit")
+    parser.add_argument('--events', type=Path, default=None,
+                        help="append one JSON line per stage run (timings, bytes, ratios) to this file")
+    parser.add_argument('--profile', type=Path, default=None,
+                        help="cProfile the pipeline stages and write merged pstats here "
+                             "(Python 3.12+ profiles one stage at a time; use -j 1 for a complete profile)")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print per-file and per-tag details")
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    unknown = [p for p in args.bench_presets or [] if p not in config.PRESET_FOLDERS]
+    if unknown:
+        parser.error(f"unknown --bench-presets: {', '.join(unknown)}")
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.events:
+        open_event_log(args.events)
+    if args.profile:
+        enable_profiling()
+    wall = time.perf_counter()
+    emit_event('run_start', argv=sys.argv[1:], jobs=args.jobs)
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print("\nInterrupted: finishing the tracks in progress, skipping the rest...")
+        cancel()
+    finally:
+        wall = time.perf_counter() - wall
+        if not args.benchmark:
+            print_stage_summary(wall)
+        scheduler = current_scheduler()
+        if scheduler and scheduler.remote:
+            scheduler.remote.close()
+        report_cache()
+        if args.profile:
+            write_profile(args.profile)
+        emit_event('run_end', wall=round(wall, 3))
+        close_event_log()
+
+
+def run(args):
+    if args.no_journal:
+        config.JOURNAL_FILE = None
+    if args.no_cache:
+        config.TRANSCODE_CACHE_DIR = None
+    config.TRANSCODE_CACHE_MAX_BYTES = int(args.cache_size * 2**30)
+    if args.no_replaygain:
+        config.REPLAYGAIN = False
+    config.SPECTRALS = args.spectrals
+    config.CHECKSUMS = args.checksums
+    config.HDD_READERS = args.hdd_readers
+    config.PIPELINE_NICE, config.PIPELINE_IONICE, config.CPU_AFFINITY = args.nice, args.ionice, args.cpus
+    config.MAX_LOAD, config.CPU_TARGET = args.max_load, args.cpu_target
+    config.ART_NORMALIZE = not args.original_art
+    if config.SPECTRALS and np is None:
+        print("Missing numpy (needed for --spectrals). Install with: pip install numpy")
+        return
+    config.VERBOSE = args.verbose
+
+    print("Welcome to DiRTY Transcode:")
+    print("Transcode your FLAC to MP3 with one easy click.")
+    print("FLAC folders must have 'flac' in the folder name.")
+    print("You can also create a .torrent for your transcodes.\n")
+    print("Note: Ensure a 'cover.jpg' or 'cover.png' is in the FLAC folder if no embedded images exist.")
+
+    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    config.TORRENT_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not check_tools():
+        return
+
+    if args.worker:
+        run_worker(parse_address(args.worker), args.jobs)
+        return
+    if args.coordinator:
+        get_scheduler(args.jobs, RemoteEncoder(parse_address(args.coordinator)))
+
+    if args.benchmark:
+        run_benchmark(args.jobs, args.bench_presets, args.bench_report)
+        return
+
+    if args.watch:
+        run_daemon(args.jobs)
+        return
+
+    with stage_timer('scan') as ev:
+        flac_folders = find_flac_folders()
+        ev['albums'] = len(flac_folders)
+    if not flac_folders:
+        print("No FLAC folders found.")
+        return
+
+    choices_dict = {}
+    for flac_folder in flac_folders:
+        choice, del_src, create_torrent, tracker_objs = prompt_conversion_choice(flac_folder.name)
+        choices_dict[flac_folder] = (choice, del_src, create_torrent, tracker_objs)
+
+    if not check_preset_deps([p for choice, *_ in choices_dict.values() for p in config.CONVERSION_CHOICES[choice][1]]):
+        return
+    if not check_torrent_deps(any(create_torrent == 'y' for _, _, create_torrent, _ in choices_dict.values())):
+        return
+
+    scheduler = get_scheduler(args.jobs)
+    for flac_folder, (choice, del_src, create_torrent, tracker_objs) in choices_dict.items():
+        scheduler.album(process_album, flac_folder, config.CONVERSION_CHOICES[choice][1], del_src, create_torrent,
+                        tracker_objs, args.jobs, args.torrent_mode, scheduler)
+
+    ok = scheduler.wait()
+    scheduler.shutdown()
+    print("\nAll done." if ok else "\nDone, with failures (see above).")
+
+
+if __name__ == "__main__":
+    main()
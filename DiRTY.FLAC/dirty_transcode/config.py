@@ -0,0 +1,179 @@
+"""Settings shared by every stage.
+
+They are read at call time as config.NAME, so the command line, a
+Transcoder or a test can change them for the whole process.
+"""
+import os
+from pathlib import Path
+
+INPUT_DIR = Path('./flac')
+OUTPUT_DIR = Path('./mp3')
+TORRENT_DIR = Path('./torrents')
+TRACKER_FILE = Path("trackers.json")
+FLAC_CMD = 'flac'
+LAME_CMD = 'lame'
+
+# Number of tracks transcoded at once (one flac | lame pipeline each)
+JOBS = os.cpu_count() or 1
+
+# Per-frame/per-file detail output (--verbose); stage timings go to the event log instead
+VERBOSE = False
+
+# LAME encoding presets
+PRESETS = {
+    'V0': ['--noreplaygain', '--vbr-new', '-V', '0', '-h', '--nohist', '--quiet'],
+    'V2': ['--noreplaygain', '--vbr-new', '-V', '2', '-h', '--nohist', '--quiet'],
+    '320': ['--noreplaygain', '-b', '320', '-h', '--nohist', '--quiet']
+}
+
+# FLAC output presets: decoded PCM is dithered (and resampled) in-process, then re-encoded
+FLAC_PRESETS = {
+    'FLAC16': {'bits': 16, 'args': ['-8']},
+}
+
+# Output folder label per preset ('flac' in the album folder name is replaced by it)
+PRESET_FOLDERS = {
+    'V0': 'MP3 V0',
+    'V2': 'MP3 V2',
+    '320': 'MP3 320',
+    'FLAC16': 'FLAC 16',
+}
+
+# Menu choice -> (label, presets encoded from a single decode of each track)
+CONVERSION_CHOICES = {
+    '1': ('V0 Only', ['V0']),
+    '2': ('320 Only', ['320']),
+    '3': ('Both', ['V0', '320']),
+    '4': ('Skip', []),
+    '5': ('V2 Only', ['V2']),
+    '6': ('All (V0, V2, 320)', ['V0', 'V2', '320']),
+    '7': ('FLAC 16-bit (from 24-bit/hi-res)', ['FLAC16']),
+}
+
+# Folder images considered as album art, and the names preferred as the cover
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+COPIED_IMAGE_EXTENSIONS = ('.jpg', '.png')   # folder images placed into the output folders
+COVER_NAMES = ('cover', 'folder', 'front')
+
+# Embedded art policy: covers bigger than this are downscaled and re-encoded as JPEG (needs Pillow)
+# once per album; the untouched originals still go into the output folders via copy_images()
+ART_NORMALIZE = True
+ART_MAX_SIZE = 1000        # longest side, pixels
+ART_MAX_BYTES = 500 * 1024
+ART_JPEG_QUALITY = 90
+ART_MIN_JPEG_QUALITY = 60  # quality is stepped down to here to get under ART_MAX_BYTES
+
+# Torrent piece size bounds; the size is picked to give roughly TORRENT_TARGET_PIECES pieces
+TORRENT_MIN_PIECE_SIZE = 1 << 18   # 256 KiB
+TORRENT_MAX_PIECE_SIZE = 1 << 24   # 16 MiB
+TORRENT_TARGET_PIECES = 1500
+
+# 'combined': one torrent announcing to all selected trackers (named after all of them, e.g. RED+OPS_...);
+# 'per-tracker': hash once, then one torrent per tracker with its own announce URL and source
+TORRENT_MODES = ('combined', 'per-tracker')
+TORRENT_MODE = 'combined'
+
+# Pipeline stages shared across albums (see PipelineScheduler)
+IO_WORKERS = 2            # concurrent image copies / source deletes
+
+# How images are put into output folders, cheapest first: a hardlink shares the source's blocks,
+# a reflink (FICLONE) shares them copy-on-write, copy_file_range copies in the kernel
+PLACEMENT_METHODS = ('hardlink', 'reflink', 'copy_file_range', 'copy')
+
+VERIFY_WORKERS = 2        # concurrent output checks (frame scans, flac --test) before sources may be deleted
+
+# Per-device I/O: reads (track read-in, image copies, checks, checksums, torrent hashing) are capped per
+# block device. On spinning disks each source FLAC is read whole into the page cache under that cap before
+# its decoder starts, and the next tracks are hinted with posix_fadvise(WILLNEED) while the current ones encode
+HDD_READERS = 2           # concurrent readers per rotational disk
+SSD_READERS = None        # no cap on SSDs and NVMe
+# Devices sysfs has no rotational flag for (btrfs, loop and dm setups, NFS, tmpfs, systems without /sys)
+# are capped like spinning disks; set False to treat them as SSDs
+UNKNOWN_ROTATIONAL = True
+PREFETCH_TRACKS = 2       # tracks hinted beyond the ones the encoders are working on
+READ_IN_CHUNK = 1 << 20
+
+# Resource governor: pipeline threads, and the flac/lame processes they start (which inherit it), run at
+# this niceness and I/O priority, optionally pinned to CPU_AFFINITY, so a torrent client seeding from the
+# same box stays responsive. None leaves a setting as it is.
+PIPELINE_NICE = 10
+PIPELINE_IONICE = ('best-effort', 7)   # class ('realtime', 'best-effort', 'idle') and level 0-7
+CPU_AFFINITY = None                    # set of CPU numbers, e.g. {2, 3}
+# Load-aware throttling: every GOVERNOR_INTERVAL seconds the CPU budget gives up a slot while the 1-minute
+# load average is over MAX_LOAD (or system CPU use is over CPU_TARGET percent), and takes one back, up to
+# --jobs, once there is a core's worth of room again
+MAX_LOAD = None
+CPU_TARGET = None
+GOVERNOR_INTERVAL = 10
+
+ALBUMS_IN_FLIGHT = 2      # albums whose stages may overlap
+
+# --coordinator / --worker: track encodes are leased to workers, which renew the lease while they
+# run; an expired lease or dropped connection puts the job back in the queue, up to REMOTE_MAX_ATTEMPTS
+REMOTE_LEASE_SECONDS = 60
+REMOTE_MAX_ATTEMPTS = 3
+REMOTE_POLL_SECONDS = 5            # how long an idle worker's request waits for a job
+WORKER_RECONNECT_SECONDS = 60      # a worker gives up after the coordinator has been gone this long
+
+# Resume journal: (audio MD5, preset, encoder version) -> output path/size/status
+JOURNAL_FILE = Path("transcode_journal.sqlite3")
+
+# Content-addressed cache of untagged encoder output: (audio MD5, preset args, encoder version) -> file.
+# Audio seen again under another folder name only gets new tags and art; least recently used goes first
+TRANSCODE_CACHE_DIR = Path("transcode_cache")
+TRANSCODE_CACHE_MAX_BYTES = 20 << 30
+
+# --benchmark: synthetic corpus (generated once, seeded) and where reports go
+BENCH_DIR = Path("bench")
+BENCH_SEED = 1234
+BENCH_ALBUMS = [
+    # name, bits, sample rate, tracks, seconds per track, embedded art, folder art
+    {'name': 'Bench Artist - Tones (2024) [FLAC]', 'bits': 16, 'rate': 44100,
+     'tracks': 8, 'seconds': 30, 'embedded_art': True, 'folder_art': True},
+    {'name': 'Bench Artist - Noise (2024) [FLAC 24-96]', 'bits': 24, 'rate': 96000,
+     'tracks': 4, 'seconds': 30, 'embedded_art': False, 'folder_art': True},
+]
+
+# --watch mode: rules applied to every album, overridable in DAEMON_PROFILE_FILE
+DAEMON_PROFILE_FILE = Path("daemon.json")
+DEFAULT_DAEMON_PROFILE = {
+    'presets': ['V0', '320'],
+    'create_torrent': False,
+    'trackers': [],            # tracker names from TRACKER_FILE, or "all"
+    'torrent_mode': TORRENT_MODE,
+    'delete_source': False,
+    'settle_seconds': 60,      # album must be unchanged this long before it is queued
+    'poll_interval': 30,       # rescan interval (also the inotify wait timeout)
+}
+
+# Hi-res sources are resampled to the 44.1 kHz or 48 kHz family rate they divide into
+FLAC16_MAX_RATE = 48000
+RESAMPLER_TAPS = 48       # filter taps per output sample, scaled by the decimation factor
+
+# ReplayGain 2.0: albums whose FLACs lack REPLAYGAIN_* tags are measured (EBU R128 / BS.1770)
+# from the decoded PCM on its way to the encoders, and tagged relative to -18 LUFS
+REPLAYGAIN = True
+REPLAYGAIN_REFERENCE = -18.0
+KWEIGHT_SECONDS = 0.1      # K-weighting impulse response length; the 38 Hz high-pass has decayed well before
+LOUDNESS_BLOCK = 1 << 14   # frames filtered per FFT block
+
+# Optional lossy-source check (--spectrals): the decoded PCM is also FFT'd into spectrogram PNGs,
+# written to "<album> (Spectrals)" in OUTPUT_DIR, and brickwall lowpasses typical of MP3/AAC are flagged
+SPECTRALS = False
+SPECTRAL_FFT = 4096
+SPECTROGRAM_WIDTH = 1200
+SPECTROGRAM_HEIGHT = 512
+SPECTROGRAM_DB_RANGE = 120
+SPECTRAL_FLOOR_DB = 60     # cutoff = highest frequency within this of the 1-8 kHz median level
+SPECTRAL_STEP_DB = 25      # level drop across the cutoff that marks a brickwall lowpass
+LOSSY_CUTOFF_HZ = 21000    # MP3/AAC encoders low-pass somewhere between 15 and 20.5 kHz
+
+# Checksum manifests (--checksums): every output folder gets "<folder>.md5" and "<folder>.sfv" for its
+# audio files, FLAC outputs also get "<folder>.ffp", and the source's STREAMINFO MD5s go to
+# "<album>.ffp" in OUTPUT_DIR so the source folder is left untouched
+CHECKSUMS = False
+CHECKSUM_WORKERS = 2        # outputs hashed at once, each read through a read-only mmap
+CHECKSUM_CHUNK = 1 << 20    # bytes per MD5/CRC32 update (both release the GIL on large buffers)
+
+# Bytes read from the decoder per write to the encoders when teeing PCM
+PCM_CHUNK_SIZE = 1 << 16
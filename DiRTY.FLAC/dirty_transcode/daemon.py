@@ -0,0 +1,211 @@
+"""--watch: an unattended daemon that processes albums once they settle."""
+import os
+import sys
+import json
+import time
+import queue
+import select
+import threading
+
+from . import config
+from .album import check_preset_deps, check_torrent_deps, find_flac_folders, process_album
+from .index import index_album
+from .pipeline import get_scheduler
+from .trackers import load_trackers
+
+
+def load_daemon_profile():
+    """Rules applied to every album picked up in --watch mode."""
+    profile = dict(config.DEFAULT_DAEMON_PROFILE)
+    if config.DAEMON_PROFILE_FILE.exists():
+        with open(config.DAEMON_PROFILE_FILE, "r") as f:
+            profile.update(json.load(f))
+    unknown = [p for p in profile['presets'] if p not in config.PRESET_FOLDERS]
+    if unknown:
+        raise ValueError(f"Unknown presets in {config.DAEMON_PROFILE_FILE}: {', '.join(unknown)}")
+    if profile['torrent_mode'] not in config.TORRENT_MODES:
+        raise ValueError(f"Unknown torrent_mode in {config.DAEMON_PROFILE_FILE}: {profile['torrent_mode']}")
+    return profile
+
+
+def profile_trackers(profile):
+    """Resolve the profile's tracker names ("all" for every tracker) to tracker objects."""
+    trackers = load_trackers()
+    names = profile['trackers']
+    if names == 'all':
+        return trackers
+    wanted = {n.lower() for n in names}
+    missing = wanted - {t['name'].lower() for t in trackers}
+    if missing:
+        print(f"Warning: trackers not in {config.TRACKER_FILE}: {', '.join(sorted(missing))}")
+    return [t for t in trackers if t['name'].lower() in wanted]
+
+
+class InotifyWatcher:
+    """Minimal inotify wrapper (ctypes, Linux only) used to wake the daemon on changes."""
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = {}  # path -> watch descriptor
+
+    def watch(self, path):
+        path = str(path)
+        if path in self._watched:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd >= 0:
+            self._watched[path] = wd
+
+    def retain(self, paths):
+        """Stop watching everything not in `paths`, so a folder recreated under an old name is watched again."""
+        keep = {str(p) for p in paths}
+        for path in [p for p in self._watched if p not in keep]:
+            wd = self._watched.pop(path)
+            # The kernel already dropped the watches of deleted folders
+            if os.path.isdir(path):
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def wait(self, timeout):
+        """Block until something changes or `timeout` seconds pass; True if woken by an event."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+
+def open_watcher():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError) as e:
+        print(f"inotify unavailable ({e}), falling back to polling")
+        return None
+
+
+class AlbumSettler:
+    """Tells when watched album folders have stopped changing, and hands out each version of one once."""
+
+    def __init__(self, settle):
+        self.settle = settle
+        self.pending = {}  # folder -> (signature, time it was last seen changing)
+        self.handled = {}  # folder -> signature when queued
+
+    def scan(self, signatures, now):
+        """Take the {folder: signature} of one scan; return the folders that have settled and are new."""
+        # A folder that was deleted or moved away is a new album if it shows up again
+        for gone in (self.pending.keys() | self.handled.keys()) - signatures.keys():
+            self.pending.pop(gone, None)
+            self.handled.pop(gone, None)
+        ready = []
+        for folder, signature in signatures.items():
+            if self.handled.get(folder) == signature:
+                continue
+            previous = self.pending.get(folder)
+            if previous is None or previous[0] != signature:
+                self.pending[folder] = (signature, now)
+            elif now - previous[1] >= self.settle and signature[0]:
+                ready.append(folder)
+                self.handled[folder] = signature
+                del self.pending[folder]
+        return ready
+
+    def timeout(self, now, poll_interval):
+        """Seconds until the next scan: the poll interval, or sooner once a folder may have settled."""
+        if not self.pending:
+            return poll_interval
+        return min(poll_interval, max(0.5, min(t + self.settle - now for _, t in self.pending.values())))
+
+
+def album_worker(jobs, profile, tracker_objs, album_queue):
+    """Process queued albums until a None sentinel arrives."""
+    create_torrent_flag = 'y' if profile['create_torrent'] else 'n'
+    del_src = 'y' if profile['delete_source'] else 'n'
+    while True:
+        flac_folder = album_queue.get()
+        try:
+            if flac_folder is None:
+                return
+            if not flac_folder.exists():
+                print(f"Album vanished before processing: {flac_folder}")
+                continue
+            print(f"\n[daemon] Processing: {flac_folder.name}")
+            ok = process_album(flac_folder, profile['presets'], del_src, create_torrent_flag, tracker_objs, jobs,
+                               profile['torrent_mode'])
+            print(f"[daemon] {'Finished' if ok else 'Failed'}: {flac_folder.name}")
+        except Exception as e:
+            print(f"[daemon] Error processing {flac_folder}: {e}")
+        finally:
+            album_queue.task_done()
+
+
+def run_daemon(jobs=config.JOBS):
+    """Watch INPUT_DIR and process every album once it has stopped changing."""
+    profile = load_daemon_profile()
+    if not check_preset_deps(profile['presets']) or not check_torrent_deps(profile['create_torrent']):
+        return
+    tracker_objs = profile_trackers(profile) if profile['create_torrent'] else []
+    settle = profile['settle_seconds']
+    config.INPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    album_queue = queue.Queue()
+    worker = threading.Thread(target=album_worker, args=(jobs, profile, tracker_objs, album_queue), daemon=True)
+    worker.start()
+
+    watcher = open_watcher()
+    print(f"[daemon] Watching {config.INPUT_DIR} ({'inotify' if watcher else 'polling'}), "
+          f"presets {', '.join(profile['presets'])}, settle {settle}s. Ctrl+C to stop.")
+
+    settler = AlbumSettler(settle)
+    try:
+        while True:
+            now = time.monotonic()
+            signatures = {}
+            watched = [config.INPUT_DIR]
+            for flac_folder in find_flac_folders():
+                index = index_album(flac_folder)
+                watched += [flac_folder] + index.dirs
+                signatures[flac_folder] = index.signature()
+            if watcher:
+                watcher.retain(watched)
+                for folder in watched:
+                    watcher.watch(folder)
+            for flac_folder in settler.scan(signatures, now):
+                print(f"[daemon] Queued: {flac_folder.name}")
+                album_queue.put(flac_folder)
+
+            timeout = settler.timeout(now, profile['poll_interval'])
+            if watcher:
+                watcher.wait(timeout)
+            else:
+                time.sleep(timeout)
+    except KeyboardInterrupt:
+        print("\n[daemon] Stopping after the current album...")
+    finally:
+        if watcher:
+            watcher.close()
+        album_queue.put(None)
+        worker.join()
+        get_scheduler(jobs).wait()
@@ -0,0 +1,115 @@
+"""Per-device read caps and page cache read-ahead for spinning disks."""
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from contextlib import contextmanager
+
+from . import config
+from .events import stage_timer, vprint
+
+
+@lru_cache(maxsize=None)
+def block_device(dev):
+    """(name, rotational) of the block device behind an st_dev, read from sysfs; rotational is None if unknown."""
+    major, minor = os.major(dev), os.minor(dev)
+    try:
+        node = Path(f'/sys/dev/block/{major}:{minor}').resolve(strict=True)
+    except OSError:
+        # btrfs, overlay, NFS, tmpfs, or no sysfs at all: nothing says what is underneath
+        return f'{major}:{minor}', None
+    # Partitions share their disk's queue
+    for queue_dir in (node / 'queue', node.parent / 'queue'):
+        try:
+            return node.name, (queue_dir / 'rotational').read_text().strip() == '1'
+        except OSError:
+            continue
+    return node.name, None
+
+
+class DeviceIO:
+    """Reader caps per block device, plus read-ahead for sources on spinning disks.
+
+    Without it, every decoder, image copy and hash thread reads its own
+    file in small pieces at once, and an HDD spends its time seeking.
+    """
+
+    def __init__(self, hdd_readers=config.HDD_READERS, ssd_readers=config.SSD_READERS, unknown_rotational=config.UNKNOWN_ROTATIONAL):
+        self.hdd_readers = hdd_readers
+        self.ssd_readers = ssd_readers
+        self.unknown_rotational = unknown_rotational
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def device(self, path):
+        """(name, rotational) of `path`'s device, with unknown devices resolved per unknown_rotational."""
+        name, rotational = block_device(os.stat(path).st_dev)
+        return name, self.unknown_rotational if rotational is None else rotational
+
+    def _gate(self, path):
+        try:
+            name, rotational = self.device(path)
+        except OSError:
+            return None
+        limit = self.hdd_readers if rotational else self.ssd_readers
+        if not limit:
+            return None
+        with self._lock:
+            if name not in self._gates:
+                vprint(f"Device {name} ({'HDD' if rotational else 'SSD'}): {limit} concurrent readers")
+                self._gates[name] = threading.BoundedSemaphore(limit)
+            return self._gates[name]
+
+    @contextmanager
+    def reading(self, path):
+        """Hold one of the reader slots of `path`'s device."""
+        gate = self._gate(path)
+        if gate is None:
+            yield
+            return
+        with gate:
+            yield
+
+    def prefetch(self, path):
+        """Ask the kernel to start reading `path` in the background (a no-op where fadvise is missing, e.g. macOS)."""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+    def read_in(self, path, album=None):
+        """Pull a source on a spinning disk into the page cache in one sequential pass.
+
+        The decoder then reads it from memory instead of seeking against
+        the other decoders. Sources on SSDs are left to the decoder.
+        """
+        if not self.device(path)[1]:
+            return
+        buf = bytearray(config.READ_IN_CHUNK)
+        with self.reading(path), stage_timer('read_in', album=album, item=Path(path).name) as ev, \
+                open(path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            total = 0
+            while n := f.readinto(buf):
+                total += n
+            ev['bytes_in'] = total
+
+
+_DEVICE_IO = None
+_DEVICE_IO_LOCK = threading.Lock()
+
+
+def get_device_io():
+    """Process-wide DeviceIO, created on first use."""
+    global _DEVICE_IO
+    with _DEVICE_IO_LOCK:
+        if _DEVICE_IO is None:
+            _DEVICE_IO = DeviceIO(config.HDD_READERS, config.SSD_READERS, config.UNKNOWN_ROTATIONAL)
+        return _DEVICE_IO
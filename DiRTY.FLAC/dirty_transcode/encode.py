@@ -0,0 +1,258 @@
+"""One track decoded once and teed into every preset's encoder."""
+import os
+import threading
+import subprocess
+
+from . import config
+from .cache import get_cache
+from .deviceio import get_device_io
+from .events import cancelled, stage_timer, vprint
+from .flac16 import Flac16Sink
+from .journal import get_journal
+from .manifest import output_file
+from .replaygain import LoudnessMeter, replaygain_tags
+from .spectral import SpectrumAnalyzer, write_track_spectral
+from .tags import write_flac_tags, write_mp3_tags
+
+
+def tee_pcm(source, sinks):
+    """Copy the decoded PCM stream to every encoder stdin until EOF."""
+    sinks = list(sinks)
+    while sinks:
+        chunk = source.read(config.PCM_CHUNK_SIZE)
+        if not chunk:
+            break
+        for sink in list(sinks):
+            try:
+                sink.write(chunk)
+            except (BrokenPipeError, ValueError):
+                # Encoder exited early; its return code reports the failure
+                sinks.remove(sink)
+    # Drain the decoder so it can exit even if every encoder died
+    while source.read(config.PCM_CHUNK_SIZE):
+        pass
+    for sink in sinks:
+        try:
+            sink.close()
+        except BrokenPipeError:
+            pass
+
+
+def finish_process(proc):
+    """Wait for a decoder/encoder whose stdin is closed; return (stderr, CPU seconds it used)."""
+    err = proc.stderr.read() if proc.stderr else b''
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        proc.wait()
+        return err, 0.0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return err, usage.ru_utime + usage.ru_stime
+
+
+def encode_outputs(track, outputs, meter=None, analyzer=None):
+    """Decode `track` once and feed every output's encoder plus the optional taps.
+
+    Returns (decoder stderr or None on success, preset -> encoder stderr or
+    None on success).
+    """
+    flac_file = track.path
+    flac_cmd = [config.FLAC_CMD, '--decode', '--stdout', '--silent', str(flac_file)]
+    with stage_timer('encode', album=flac_file.parent.name, item=str(track.rel_path),
+                     presets=list(outputs)) as ev:
+        with subprocess.Popen(flac_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as flac_proc:
+            procs = {}
+            lease = current_lease()
+            if lease:
+                # A revoked lease kills the decoder; the encoders then see EOF and exit
+                lease.register(flac_proc)
+            try:
+                if len(outputs) == 1 and next(iter(outputs)) in config.PRESETS and not (meter or analyzer):
+                    # Single MP3 target: let the kernel pipe PCM straight into lame
+                    preset, out_file = next(iter(outputs.items()))
+                    lame_cmd = [config.LAME_CMD] + config.PRESETS[preset] + ['-', str(out_file)]
+                    procs[preset] = subprocess.Popen(lame_cmd, stdin=flac_proc.stdout,
+                                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                    flac_proc.stdout.close()
+                else:
+                    sinks = []
+                    for preset, out_file in outputs.items():
+                        if preset in config.FLAC_PRESETS:
+                            sink = Flac16Sink(track, out_file, preset)
+                            procs[preset] = sink.proc
+                            sinks.append(sink)
+                            continue
+                        lame_cmd = [config.LAME_CMD] + config.PRESETS[preset] + ['-', str(out_file)]
+                        procs[preset] = subprocess.Popen(lame_cmd, stdin=subprocess.PIPE,
+                                                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                        sinks.append(procs[preset].stdin)
+                    sinks.extend(tap for tap in (meter, analyzer) if tap)
+                    tee_pcm(flac_proc.stdout, sinks)
+                flac_err, child_cpu = finish_process(flac_proc)
+                errors = {}
+                for preset, proc in procs.items():
+                    errors[preset], cpu = finish_process(proc)
+                    child_cpu += cpu
+            finally:
+                for proc in procs.values():
+                    if proc.poll() is None:
+                        proc.kill()
+                    proc.wait()
+        ev['child_cpu'] = round(child_cpu, 4)
+        ev['bytes_in'] = track.size
+        ev['bytes_out'] = sum(f.stat().st_size for f in outputs.values() if f.exists())
+        ev['ok'] = flac_proc.returncode == 0 and all(p.returncode == 0 for p in procs.values())
+    return (None if flac_proc.returncode == 0 else flac_err,
+            {preset: None if proc.returncode == 0 else errors[preset] for preset, proc in procs.items()})
+
+
+def transcode_track(track, targets, cover, measure=False, spectrals=None):
+    """Decode one track once and encode it to every preset in `targets`.
+
+    `targets` maps preset -> output folder. Returns preset -> success.
+    Presets found in the transcode cache are restored instead of encoded
+    and only get new tags and art. With `measure`, the decoded PCM is also
+    run through a LoudnessMeter and the outputs get computed track gain in
+    place of the source's. With a `spectrals` folder, a SpectrumAnalyzer
+    taps it too and the track's spectrogram is saved there.
+    """
+    flac_file = track.path
+    results = dict.fromkeys(targets, False)
+    if cancelled():
+        return results
+    journal = get_journal()
+    cache = get_cache()
+    outputs = {}
+    restored = {}
+    for preset, output_path in targets.items():
+        out_file = output_file(output_path, track, preset)
+        if journal and journal.is_done(track.md5, preset, out_file):
+            print(f"Already transcoded, skipping: {out_file}")
+            results[preset] = True
+            continue
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        if cache and cache.restore(track.md5, preset, out_file):
+            restored[preset] = out_file
+        else:
+            outputs[preset] = out_file
+    if measure and not track.loudness and journal:
+        # Measured on an earlier run, so skipped and restored presets need no decode for it
+        track.loudness = journal.loudness(track.md5)
+    if not outputs and not restored:
+        if not measure or track.loudness:
+            return results
+        # Every preset is done, but album gain still needs this track's measurement
+        print(f"Measuring loudness: {flac_file}")
+
+    if restored:
+        print(f"From transcode cache: {', '.join(str(f) for f in restored.values())}")
+    if outputs:
+        print(f"Transcoding: {flac_file} -> {', '.join(str(f) for f in outputs.values())}")
+    if journal:
+        for preset, out_file in outputs.items():
+            journal.mark(track.md5, preset, out_file, 'started')
+    try:
+        meter = LoudnessMeter(track) if measure and not track.loudness else None
+        analyzer = SpectrumAnalyzer(track) if spectrals else None
+        # Restored presets still need a decode if the loudness/spectrum taps want the PCM
+        if outputs or meter or analyzer:
+            get_device_io().read_in(flac_file, flac_file.parent.name)
+            flac_err, errors = encode_outputs(track, outputs, meter, analyzer)
+            if lease_revoked():
+                # Another worker owns these outputs now; leave them (and the cache and journal) alone
+                return results
+            if flac_err is not None:
+                print(f"FLAC decode failed: {flac_err.decode()}")
+                return results
+
+        if analyzer:
+            track.spectrum = write_track_spectral(track, analyzer, spectrals)
+
+        tags, vorbis = track.tags, track.vorbis
+        if meter:
+            track.loudness = meter.result()
+            if journal:
+                journal.store_loudness(track.md5, track.loudness)
+        if measure and track.loudness:
+            gain = replaygain_tags('TRACK', [track.loudness])
+            # Measured gain replaces whatever (possibly partial) ReplayGain the source had
+            tags = {k: v for k, v in tags.items() if not k.startswith('REPLAYGAIN_')}
+            vorbis = {k: v for k, v in vorbis.items() if not k.upper().startswith('REPLAYGAIN_')}
+            tags.update(gain)
+            vorbis.update({k.lower(): [v] for k, v in gain.items()})
+
+        for preset, out_file in {**outputs, **restored}.items():
+            if lease_revoked():
+                return results
+            if preset in outputs:
+                if errors[preset] is not None:
+                    encoder = 'FLAC' if preset in config.FLAC_PRESETS else 'LAME'
+                    print(f"{encoder} encode failed ({preset}): {errors[preset].decode()}")
+                    continue
+
+                if not out_file.exists() or out_file.stat().st_size == 0:
+                    print(f"Output file {out_file} was not created or is empty")
+                    continue
+
+                # Cache the untagged encoder output; tags and art are per release
+                if cache:
+                    cache.store(track.md5, preset, out_file)
+
+            # Write tags and cover art in one pass
+            if not cover:
+                vprint(f"No image available for {out_file}")
+            # Art is embedded in the same save as the text tags, so it is timed here too
+            with stage_timer('tag_write', album=flac_file.parent.name, item=str(out_file.name), preset=preset,
+                             art_bytes=len(cover.data) if cover else 0) as ev:
+                if preset in config.FLAC_PRESETS:
+                    tagged = write_flac_tags(out_file, vorbis, cover)
+                else:
+                    tagged = write_mp3_tags(out_file, tags, cover)
+                ev['ok'] = tagged
+                ev['bytes_out'] = out_file.stat().st_size
+            if not tagged:
+                continue
+
+            results[preset] = True
+            if journal:
+                journal.mark(track.md5, preset, out_file, 'done', out_file.stat().st_size)
+
+    except Exception as e:
+        print(f"Error transcoding {flac_file}: {e}")
+
+    return results
+
+
+class WorkerLease:
+    """A worker's hold on one job. Revoking it kills the job's decoder and encoders."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs = []
+        self.revoked = False
+
+    def register(self, proc):
+        with self._lock:
+            self._procs.append(proc)
+            if self.revoked:
+                proc.kill()
+
+    def revoke(self):
+        with self._lock:
+            self.revoked = True
+            for proc in self._procs:
+                if proc.poll() is None:
+                    proc.kill()
+
+
+# The lease of the job running on this thread, if it is a worker slot
+_LEASE = threading.local()
+
+
+def current_lease():
+    return getattr(_LEASE, 'lease', None)
+
+
+def lease_revoked():
+    lease = current_lease()
+    return lease is not None and lease.revoked
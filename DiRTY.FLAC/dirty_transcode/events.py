@@ -0,0 +1,188 @@
+"""Stage timing, progress events, profiling and cooperative cancellation."""
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from . import config
+from .lazy import cProfile, pstats
+
+STAGE_STATS = {}
+_STATS_LOCK = threading.Lock()
+_EVENT_LOG = None
+_EVENT_LOCK = threading.Lock()
+_LISTENERS = []
+_PROFILE = None
+_CANCEL = threading.Event()
+
+
+def vprint(*args):
+    """Per-file/per-frame detail, only shown with --verbose."""
+    if config.VERBOSE:
+        print(*args)
+
+
+def open_event_log(path):
+    """Start writing JSON-lines events (one per stage run) to `path`."""
+    global _EVENT_LOG
+    _EVENT_LOG = open(path, 'a', buffering=1)
+
+
+def close_event_log():
+    global _EVENT_LOG
+    with _EVENT_LOCK:
+        if _EVENT_LOG:
+            _EVENT_LOG.close()
+            _EVENT_LOG = None
+
+
+def add_listener(callback):
+    """Call `callback(record)` for every event, on the pipeline thread that emitted it."""
+    with _EVENT_LOCK:
+        _LISTENERS.append(callback)
+
+
+def remove_listener(callback):
+    with _EVENT_LOCK:
+        if callback in _LISTENERS:
+            _LISTENERS.remove(callback)
+
+
+def emit_event(event, **fields):
+    if _EVENT_LOG is None and not _LISTENERS:
+        return
+    record = {'ts': round(time.time(), 3), 'event': event, 'thread': threading.current_thread().name, **fields}
+    with _EVENT_LOCK:
+        listeners = list(_LISTENERS)
+    for listener in listeners:
+        try:
+            listener(record)
+        except Exception as e:
+            print(f"Event listener failed on {event}: {e}")
+    if _EVENT_LOG is None:
+        return
+    line = json.dumps(record, default=str)
+    with _EVENT_LOCK:
+        if _EVENT_LOG:
+            _EVENT_LOG.write(line + '\n')
+
+
+def cancel():
+    """Stop cooperatively: queued tracks and albums are skipped, encodes in progress finish."""
+    _CANCEL.set()
+    emit_event('cancel')
+
+
+def cancelled():
+    return _CANCEL.is_set()
+
+
+def reset_cancel():
+    _CANCEL.clear()
+
+
+def enable_profiling():
+    global _PROFILE
+    _PROFILE = []
+
+
+def _start_profile():
+    if _PROFILE is None:
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process; this stage run goes unprofiled
+        return None
+    return profile
+
+
+def write_profile(path):
+    """Merge the per-stage profiles into one pstats file and print the top entries."""
+    profiles = [p for p in _PROFILE or [] if p.getstats()]
+    if not profiles:
+        print("No profile data collected.")
+        return
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(path)
+    print(f"\nProfile written to {path} (top 20 by cumulative time):")
+    stats.sort_stats('cumulative').print_stats(20)
+
+
+@contextmanager
+def stage_timer(name, **fields):
+    """Time one run of a pipeline stage.
+
+    Yields a dict the caller can fill with bytes_in/bytes_out, child_cpu
+    (encoder subprocesses) or any other detail. On exit the run is added
+    to STAGE_STATS and emitted as a 'stage' event.
+    """
+    ev = dict(fields)
+    profile = _start_profile()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    ok = True
+    try:
+        yield ev
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        if profile:
+            profile.disable()
+            with _STATS_LOCK:
+                _PROFILE.append(profile)
+        ev['wall'] = round(wall, 4)
+        ev['cpu'] = round(cpu, 4)
+        ev.setdefault('ok', ok)
+        if ev.get('bytes_in') and ev.get('bytes_out'):
+            ev['ratio'] = round(ev['bytes_in'] / ev['bytes_out'], 3)
+        with _STATS_LOCK:
+            stats = STAGE_STATS.setdefault(name, {'calls': 0, 'failed': 0, 'wall': 0.0, 'cpu': 0.0,
+                                                  'child_cpu': 0.0, 'bytes_in': 0, 'bytes_out': 0})
+            stats['calls'] += 1
+            stats['failed'] += not ev['ok']
+            stats['wall'] += wall
+            stats['cpu'] += cpu
+            stats['child_cpu'] += ev.get('child_cpu', 0.0)
+            stats['bytes_in'] += ev.get('bytes_in', 0)
+            stats['bytes_out'] += ev.get('bytes_out', 0)
+        emit_event('stage', stage=name, **ev)
+
+
+def reset_stage_stats():
+    with _STATS_LOCK:
+        STAGE_STATS.clear()
+
+
+def stage_summary():
+    """STAGE_STATS with derived compression ratios, rounded for reports."""
+    with _STATS_LOCK:
+        summary = {}
+        for name, stats in sorted(STAGE_STATS.items()):
+            entry = {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}
+            if stats['bytes_in'] and stats['bytes_out']:
+                entry['ratio'] = round(stats['bytes_in'] / stats['bytes_out'], 3)
+            summary[name] = entry
+        return summary
+
+
+def print_stage_summary(wall=None):
+    summary = stage_summary()
+    if not summary:
+        return
+    print("\nStage summary (wall/cpu summed over parallel runs):")
+    print(f"  {'stage':<14}{'calls':>7}{'fail':>6}{'wall s':>10}{'cpu s':>9}{'enc cpu s':>11}"
+          f"{'MB in':>10}{'MB out':>10}{'ratio':>8}")
+    for name, st in summary.items():
+        print(f"  {name:<14}{st['calls']:>7}{st['failed']:>6}{st['wall']:>10.2f}{st['cpu']:>9.2f}"
+              f"{st['child_cpu']:>11.2f}{st['bytes_in'] / 1e6:>10.1f}{st['bytes_out'] / 1e6:>10.1f}"
+              f"{st['ratio'] if 'ratio' in st else '-':>8}")
+    if wall is not None:
+        print(f"  total wall time: {wall:.2f}s")
+    emit_event('summary', wall=wall, stages=summary)
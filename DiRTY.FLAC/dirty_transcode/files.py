@@ -0,0 +1,79 @@
+"""Placing images into output folders by hardlink, reflink, copy_file_range or copy."""
+import os
+import shutil
+from pathlib import Path
+
+from . import config
+from .deviceio import get_device_io
+from .events import stage_timer, vprint
+from .index import index_album
+
+FICLONE = 0x40049409
+
+
+def _clone_into(fsrc, fdst, method):
+    if method == 'reflink':
+        import fcntl
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return
+    size = os.fstat(fsrc.fileno()).st_size
+    done = 0
+    while done < size:
+        n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - done)
+        if n == 0:
+            raise OSError(f"copy_file_range stopped after {done} of {size} bytes")
+        done += n
+
+
+def place_file(src, dest, hardlink=True):
+    """Put a copy of `src` at `dest` as cheaply as the filesystem allows; returns the method used.
+
+    Pass hardlink=False when `dest` will be modified in place.
+    """
+    if dest.exists():
+        if hardlink and os.path.samefile(src, dest):
+            return 'hardlink'
+        dest.unlink()
+    if hardlink and 'hardlink' in config.PLACEMENT_METHODS:
+        try:
+            os.link(src, dest)
+            return 'hardlink'
+        except OSError:
+            pass
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        for method in ('reflink', 'copy_file_range'):
+            if method not in config.PLACEMENT_METHODS or (method == 'copy_file_range' and not hasattr(os, 'copy_file_range')):
+                continue
+            try:
+                _clone_into(fsrc, fdst, method)
+                break
+            except (OSError, ImportError):
+                fdst.seek(0)
+                fdst.truncate()
+        else:
+            method = 'copy'
+            fsrc.seek(0)
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    shutil.copymode(src, dest)
+    return method
+
+
+def copy_images(src, dest, index=None):
+    with stage_timer('image_copy', album=Path(src).name, dest=Path(dest).name) as ev:
+        ev['bytes_out'], ev['methods'] = _copy_images(index or index_album(src), Path(dest))
+
+
+def _copy_images(index, dest):
+    placed = 0
+    methods = {}
+    for image in index.images:
+        if image.path.suffix.lower() not in config.COPIED_IMAGE_EXTENSIONS:
+            continue
+        target = dest / image.rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with get_device_io().reading(image.path):
+            method = place_file(image.path, target)
+        methods[method] = methods.get(method, 0) + 1
+        placed += image.size
+        vprint(f"Placed {image.rel_path} at {target} ({method})")
+    return placed, methods
@@ -0,0 +1,114 @@
+"""16-bit FLAC output: streaming resample, dither and flac encode."""
+import math
+import subprocess
+
+from . import config
+from .lazy import np
+from .pcm import WavStream
+
+
+def flac16_sample_rate(sample_rate):
+    """Target rate for a 16-bit copy: hi-res rates drop to the 44.1k/48k family rate they divide into."""
+    if sample_rate <= config.FLAC16_MAX_RATE:
+        return sample_rate
+    for base in (44100, 48000):
+        if sample_rate % base == 0:
+            return base
+    return 44100
+
+
+class PolyphaseResampler:
+    """Streaming rational (up/down) resampler with a Kaiser-windowed sinc, vectorized per chunk."""
+
+    def __init__(self, up, down, channels):
+        self.up, self.down = up, down
+        self.taps = math.ceil(config.RESAMPLER_TAPS * max(up, down) / up)
+        n = self.taps * up
+        # Odd filter length so the group delay is a whole number of samples
+        m = n if n % 2 else n - 1
+        cutoff = 0.5 / max(up, down) * 0.92
+        t = np.arange(m) - (m - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(m, 9.0) * up
+        h = np.append(h, np.zeros(n - m))
+        # Phase p uses h[p], h[p + up], ...: row p is applied to x[i0], x[i0 - 1], ...
+        self._phases = h.reshape(self.taps, up).T.copy()
+        self._history = np.zeros((self.taps - 1, channels))
+        self._base = 0                     # absolute index of the first sample after the history
+        self._next = (m - 1) // 2          # upsampled position of the next output (group delay compensated)
+        self._frames_in = 0
+        self._frames_out = 0
+
+    def process(self, x):
+        self._frames_in += len(x)
+        return self._run(x, limit=None)
+
+    def flush(self):
+        """Push zeros through the filter tail and trim to the exact output length."""
+        expected = -(-self._frames_in * self.up // self.down)
+        tail = np.zeros((self.taps, self._history.shape[1]))
+        return self._run(tail, limit=expected)
+
+    def _run(self, x, limit):
+        buf = np.concatenate((self._history, x))
+        last = self._base + len(x) - 1
+        end = (last + 1) * self.up
+        count = 0 if self._next >= end else (end - 1 - self._next) // self.down + 1
+        if limit is not None:
+            count = max(0, min(count, limit - self._frames_out))
+        pos = self._next + self.down * np.arange(count)
+        local = pos // self.up - self._base + self.taps - 1
+        windows = buf[local[:, None] - np.arange(self.taps)[None, :]]
+        y = np.einsum('kt,ktc->kc', self._phases[pos % self.up], windows)
+
+        self._next += self.down * count
+        self._frames_out += count
+        self._base += len(x)
+        self._history = buf[len(buf) - (self.taps - 1):]
+        return y
+
+
+class Flac16Sink:
+    """Decoded WAV in, 16-bit FLAC out: resample and TPDF-dither in bounded-memory chunks.
+
+    Bit depth, rate and channel count come from the track's STREAMINFO; the
+    WAV header from `flac --decode` is only skipped. 16-bit sources at a
+    kept rate pass through untouched.
+    """
+
+    def __init__(self, track, output_file, preset='FLAC16'):
+        self.wav = WavStream(track)
+        self.channels = track.channels
+        self.rate = flac16_sample_rate(track.sample_rate)
+        g = math.gcd(self.rate, track.sample_rate)
+        up, down = self.rate // g, track.sample_rate // g
+        self.resampler = PolyphaseResampler(up, down, self.channels) if up != down else None
+        self.passthrough = self.resampler is None and track.bits_per_sample == 16
+        self._rng = np.random.default_rng()
+
+        cmd = [config.FLAC_CMD, '--silent', '--force-raw-format', '--endian=little', '--sign=signed',
+               f'--channels={self.channels}', '--bps=16', f'--sample-rate={self.rate}'
+               ] + config.FLAC_PRESETS[preset]['args'] + ['-f', '-o', str(output_file), '-']
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def _emit(self, y):
+        if not len(y):
+            return
+        # TPDF dither of +-1 LSB, then round and clip to 16 bits
+        dither = self._rng.random(y.shape) - self._rng.random(y.shape)
+        out = np.clip(np.rint(y * 32768.0 + dither), -32768, 32767).astype('<i2')
+        self.proc.stdin.write(out.tobytes())
+
+    def write(self, data):
+        pcm = self.wav.pcm(data)
+        if not pcm:
+            return
+        if self.passthrough:
+            self.proc.stdin.write(pcm)
+            return
+        x = self.wav.to_float(pcm)
+        self._emit(self.resampler.process(x) if self.resampler else x)
+
+    def close(self):
+        if self.resampler and self.wav.in_data:
+            self._emit(self.resampler.flush())
+        self.proc.stdin.close()
@@ -0,0 +1,128 @@
+"""Niceness, I/O priority, CPU affinity and load-aware CPU budget for the pipeline."""
+import os
+import platform
+import threading
+
+from . import config
+from .events import emit_event
+
+IOPRIO_CLASSES = {'realtime': 1, 'best-effort': 2, 'idle': 3}
+SYS_IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'armv7l': 314}
+
+_GOVERN_WARNED = set()
+
+
+def _govern_warn(what, error):
+    if what not in _GOVERN_WARNED:
+        _GOVERN_WARNED.add(what)
+        print(f"Could not set {what} for pipeline threads: {error}")
+
+
+def set_io_priority(io_class, level):
+    """ioprio_set() for the calling thread (Python has no wrapper for it)."""
+    import ctypes
+    import ctypes.util
+    number = SYS_IOPRIO_SET.get(platform.machine())
+    if number is None:
+        raise OSError(f"no ioprio_set syscall number for {platform.machine()}")
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    # IOPRIO_WHO_PROCESS with pid 0 is the calling thread
+    if libc.syscall(number, 1, 0, (IOPRIO_CLASSES[io_class] << 13) | level) < 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+
+def govern_thread():
+    """Apply PIPELINE_NICE, PIPELINE_IONICE and CPU_AFFINITY to the calling thread.
+
+    Used as the initializer of every pipeline pool. On Linux these are
+    per-thread and inherited by child processes, so the encoders, the
+    torrent hash threads and flac --test all run governed while the
+    caller's own threads keep their priority.
+    """
+    if config.PIPELINE_NICE is not None:
+        try:
+            current = os.getpriority(os.PRIO_PROCESS, 0)
+            if config.PIPELINE_NICE > current:
+                os.setpriority(os.PRIO_PROCESS, 0, config.PIPELINE_NICE)
+        except OSError as e:
+            _govern_warn('niceness', e)
+    if config.PIPELINE_IONICE is not None:
+        try:
+            set_io_priority(*config.PIPELINE_IONICE)
+        except OSError as e:
+            _govern_warn('I/O priority', e)
+    if config.CPU_AFFINITY:
+        try:
+            os.sched_setaffinity(0, config.CPU_AFFINITY)
+        except OSError as e:
+            _govern_warn('CPU affinity', e)
+
+
+def parse_cpu_list(value):
+    """'0-3,6' -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for part in value.split(','):
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def parse_ionice(value):
+    """'idle', 'best-effort' or 'best-effort:7' -> (class, level)"""
+    io_class, _, level = value.partition(':')
+    if io_class not in IOPRIO_CLASSES:
+        raise ValueError(f"unknown I/O class {io_class!r}")
+    return io_class, int(level or 4)
+
+
+def cpu_times():
+    """(busy, total) jiffies across all CPUs from /proc/stat."""
+    with open('/proc/stat') as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[3] + fields[4]  # idle + iowait
+    total = sum(fields[:8])       # guest time is already counted in user/nice
+    return total - idle, total
+
+
+class LoadGovernor:
+    """Shrinks and grows a CpuBudget with the system load, one slot per GOVERNOR_INTERVAL."""
+
+    def __init__(self, budget, max_slots, max_load=None, cpu_target=None, interval=config.GOVERNOR_INTERVAL):
+        self.budget = budget
+        self.max_slots = max_slots
+        self.max_load = max_load
+        self.cpu_target = cpu_target
+        self.interval = interval
+        self.cpus = len(os.sched_getaffinity(0))
+        self._last = cpu_times()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='governor', daemon=True)
+        self._thread.start()
+
+    def headroom(self):
+        """Cores' worth of load the box can still take; negative when over target."""
+        if self.max_load is not None:
+            load = os.getloadavg()[0]
+            return self.max_load - load, f"load {load:.2f}/{self.max_load:g}"
+        busy, total = cpu_times()
+        used = (busy - self._last[0]) / max(1, total - self._last[1]) * 100
+        self._last = (busy, total)
+        return (self.cpu_target - used) / 100 * self.cpus, f"CPU {used:.0f}%/{self.cpu_target:g}%"
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            room, reading = self.headroom()
+            slots = self.budget.slots
+            if room < 0 and slots > 1:
+                slots -= 1
+            elif room >= 1 and slots < self.max_slots:
+                slots += 1
+            else:
+                continue
+            self.budget.resize(slots)
+            print(f"[governor] {reading}: {slots} CPU slot(s)")
+            emit_event('governor', reading=reading, slots=slots)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,71 @@
+"""One scandir walk over an album folder, disc subfolders included."""
+import os
+import re
+from pathlib import Path
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from . import config
+
+IndexedFile = namedtuple('IndexedFile', 'path rel_path size mtime')
+
+
+def natural_key(rel_path):
+    """Sort key that puts 'CD2' before 'CD10' and '2 - x' before '10 - x'."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', str(rel_path))]
+
+
+@dataclass
+class AlbumIndex:
+    """Every file of an album folder, disc subfolders included, from one scandir walk."""
+    folder: Path
+    flac: list = field(default_factory=list)
+    images: list = field(default_factory=list)
+    logs: list = field(default_factory=list)
+    cues: list = field(default_factory=list)
+    other: list = field(default_factory=list)
+    dirs: list = field(default_factory=list)
+
+    @property
+    def files(self):
+        return self.flac + self.images + self.logs + self.cues + self.other
+
+    @property
+    def total_size(self):
+        return sum(f.size for f in self.files)
+
+    def signature(self):
+        """(file count, total size, newest mtime), to tell when a folder has stopped changing."""
+        files = self.files
+        return len(files), sum(f.size for f in files), max((f.mtime for f in files), default=0.0)
+
+
+def index_album(folder):
+    """Walk `folder` once with os.scandir, sorting files by kind with their sizes and mtimes."""
+    folder = Path(folder)
+    index = AlbumIndex(folder)
+    buckets = {'.flac': index.flac, '.log': index.logs, '.cue': index.cues}
+    buckets.update((ext, index.images) for ext in config.IMAGE_EXTENSIONS)
+    pending = [folder]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                    index.dirs.append(Path(entry.path))
+                    continue
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            path = Path(entry.path)
+            item = IndexedFile(path, path.relative_to(folder), st.st_size, st.st_mtime)
+            buckets.get(path.suffix.lower(), index.other).append(item)
+    for files in (index.flac, index.images, index.logs, index.cues, index.other):
+        files.sort(key=lambda f: natural_key(f.rel_path))
+    return index
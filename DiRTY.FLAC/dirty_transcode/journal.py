@@ -0,0 +1,120 @@
+"""SQLite journal of finished encodes and loudness measurements, so a rerun only redoes lost work."""
+import time
+import sqlite3
+import threading
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+
+from . import config
+from .lazy import np
+from .manifest import Loudness
+
+
+@lru_cache(maxsize=None)
+def encoder_version(cmd=config.LAME_CMD):
+    """First line of `<cmd> --version`, so an encoder upgrade invalidates journal and cache entries."""
+    try:
+        result = subprocess.run([cmd, '--version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0].strip() if result.stdout else cmd
+    except OSError:
+        return cmd
+
+
+def preset_encoder(preset):
+    return encoder_version(config.FLAC_CMD if preset in config.FLAC_PRESETS else config.LAME_CMD)
+
+
+def preset_key(preset):
+    args = config.FLAC_PRESETS[preset]['args'] if preset in config.FLAC_PRESETS else config.PRESETS[preset]
+    return f"{preset}:{' '.join(args)}"
+
+
+class TranscodeJournal:
+    """SQLite record of finished encodes, so a rerun only redoes lost work.
+
+    A row is written as 'started' before the encoder runs and flipped to
+    'done' with the final size once tags are written. Anything else (a
+    crash mid-encode, a missing or resized output) is treated as not done.
+    Loudness measurements are kept per source MD5 too, so album gain can
+    still be computed when a rerun skips tracks that are already done.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS tracks (
+            md5 TEXT NOT NULL,
+            preset TEXT NOT NULL,
+            encoder TEXT NOT NULL,
+            output TEXT NOT NULL,
+            size INTEGER,
+            status TEXT NOT NULL,
+            updated REAL NOT NULL,
+            PRIMARY KEY (md5, preset, encoder, output))""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS loudness (
+            md5 TEXT PRIMARY KEY,
+            blocks BLOB NOT NULL,
+            peak REAL NOT NULL)""")
+
+    @staticmethod
+    def usable(md5):
+        # Encoders that skipped the MD5 leave it zeroed; such tracks can't be identified
+        return bool(md5) and md5.strip('0') != ''
+
+    def is_done(self, md5, preset, output):
+        if not self.usable(md5):
+            return False
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, status FROM tracks WHERE md5=? AND preset=? AND encoder=? AND output=?",
+                (md5, preset_key(preset), preset_encoder(preset), str(output))).fetchone()
+        if not row or row[1] != 'done':
+            return False
+        try:
+            return Path(output).stat().st_size == row[0]
+        except FileNotFoundError:
+            return False
+
+    def mark(self, md5, preset, output, status, size=None):
+        if not self.usable(md5):
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tracks (md5, preset, encoder, output, size, status, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (md5, preset_key(preset), preset_encoder(preset), str(output), size, status, time.time()))
+
+    def loudness(self, md5):
+        if not self.usable(md5):
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT blocks, peak FROM loudness WHERE md5=?", (md5,)).fetchone()
+        return Loudness(np.frombuffer(row[0], '<f8'), row[1]) if row else None
+
+    def store_loudness(self, md5, loudness):
+        if not self.usable(md5):
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO loudness (md5, blocks, peak) VALUES (?, ?, ?)",
+                             (md5, loudness.blocks.astype('<f8').tobytes(), loudness.peak))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_JOURNAL = None
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_journal():
+    """Shared journal, opened on first use; None when resuming is disabled."""
+    global _JOURNAL
+    if config.JOURNAL_FILE is None:
+        return None
+    with _JOURNAL_LOCK:
+        if _JOURNAL is None:
+            _JOURNAL = TranscodeJournal(config.JOURNAL_FILE)
+        return _JOURNAL
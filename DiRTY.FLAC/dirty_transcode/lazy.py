@@ -0,0 +1,38 @@
+"""Optional dependencies, imported on first use."""
+import importlib.util
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    The import goes through the normal import lock, so pipeline threads
+    racing to use it all get the fully initialized module.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    """LazyModule for `name`, or None if it is not installed."""
+    try:
+        spec = importlib.util.find_spec(name)
+    except ModuleNotFoundError:
+        return None
+    return LazyModule(name) if spec else None
+
+
+# Heavy optional dependencies stay unloaded until a stage needs them; mutagen is
+# imported inside the functions that read or write tags
+torf = lazy_import('torf')
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+# Only --profile uses these
+cProfile = lazy_import('cProfile')
+pstats = lazy_import('pstats')
@@ -0,0 +1,114 @@
+"""The album manifest: every track's tags, STREAMINFO and size, read once before encoding."""
+import re
+from pathlib import Path
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from . import config
+from .art import AlbumArt, cache_album_art, embedded_cover, get_album_image, get_cached_album_art, normalize_album_art
+from .events import stage_timer, vprint
+from .index import AlbumIndex, index_album
+from .tags import preprocess_flac_tags, read_flac_tags
+
+
+@dataclass
+class TrackInfo:
+    """One source FLAC: location, size, MP3-ready tags and STREAMINFO."""
+    path: Path
+    rel_path: Path
+    size: int
+    tags: dict = field(default_factory=dict)
+    vorbis: dict = field(default_factory=dict)
+    sample_rate: int = 0
+    bits_per_sample: int = 0
+    channels: int = 0
+    total_samples: int = 0
+    md5: str = ''
+    loudness: object = None  # Loudness measured while transcoding, for album gain
+    spectrum: object = None  # Spectrum from the optional spectral check
+
+    @property
+    def length(self):
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
+
+
+@dataclass
+class AlbumManifest:
+    """Everything known about an album, read once before any encoding starts."""
+    folder: Path
+    tracks: list
+    art: AlbumArt = None
+    index: AlbumIndex = None
+    checksums: dict = field(default_factory=dict)  # preset -> track rel_path -> Future of file_checksums()
+
+    @property
+    def total_size(self):
+        return sum(t.size for t in self.tracks)
+
+
+def read_track(entry, flac_folder):
+    """Parse one indexed FLAC's metadata blocks into a TrackInfo (and cache its art)."""
+    from mutagen.flac import FLAC
+    flac_file = entry.path
+    track = TrackInfo(path=flac_file, rel_path=entry.rel_path, size=entry.size)
+    tags = {}
+    try:
+        audio = FLAC(flac_file)
+        tags = read_flac_tags(audio)
+        if audio.tags:
+            track.vorbis = audio.tags.as_dict()
+        info = audio.info
+        track.sample_rate = info.sample_rate
+        track.bits_per_sample = info.bits_per_sample
+        track.channels = info.channels
+        track.total_samples = info.total_samples
+        track.md5 = tags['MD5']
+
+        # First embedded picture becomes the album art for every preset
+        if audio.pictures and get_cached_album_art(flac_folder) is None:
+            cover = embedded_cover(audio.pictures)
+            if cover:
+                print(f"Using embedded image from {flac_file} ({len(cover[0])} bytes)")
+                cache_album_art(flac_folder, *cover, flac_file)
+    except Exception as e:
+        print(f"Error reading tags from {flac_file}: {e}")
+
+    # Store filepath for TITLE fallback
+    tags['FILEPATH'] = str(flac_file)
+    track.tags = preprocess_flac_tags(tags, flac_folder)
+    # Tracks in CD1/, Disc 2/ ... folders get their disc number from the folder if untagged
+    if 'DISCNUMBER' not in track.tags and len(track.rel_path.parts) > 1:
+        match = re.search(r'(?:cd|dis[ck])\s*(\d+)', track.rel_path.parts[0], re.IGNORECASE)
+        if match:
+            track.tags['DISCNUMBER'] = str(int(match.group(1)))
+    vprint(f"FLAC {track.rel_path}: {track.sample_rate} Hz, {track.bits_per_sample} bit, "
+           f"{track.channels} ch, {track.total_samples} samples, {len(track.tags)} tags")
+    return track
+
+
+def build_album_manifest(flac_folder, index=None):
+    """Read every track's tags, STREAMINFO and size, plus the album art, in one pass.
+
+    FLACs come from the album index, so disc subfolders (CD1/, CD2/ ...) are
+    included and keep their layout in every output.
+    """
+    flac_folder = Path(flac_folder)
+    with stage_timer('scan', album=flac_folder.name) as ev:
+        index = index or index_album(flac_folder)
+        ev.update(files=len(index.files), bytes_in=index.total_size)
+    with stage_timer('tag_read', album=flac_folder.name) as ev:
+        tracks = [read_track(entry, flac_folder) for entry in index.flac]
+        art = get_album_image(flac_folder, index=index) if tracks else None
+        ev['tracks'] = len(tracks)
+        ev['art_bytes'] = len(art.data) if art else 0
+    # Every track and preset embeds the normalized art; copy_images() still places the originals
+    art = normalize_album_art(art)
+    return AlbumManifest(folder=flac_folder, tracks=tracks, art=art, index=index)
+
+
+Loudness = namedtuple('Loudness', 'blocks peak')
+
+
+def output_file(output_path, track, preset):
+    suffix = '.flac' if preset in config.FLAC_PRESETS else '.mp3'
+    return output_path / track.rel_path.with_suffix(suffix)
@@ -0,0 +1,51 @@
+"""The decoder's WAV stream as PCM for the in-process taps."""
+from .lazy import np
+
+
+class WavStream:
+    """Incremental reader for the WAV stream `flac --decode` writes.
+
+    The format comes from the track's STREAMINFO, so the RIFF header is only
+    skipped. Partial frames are carried over to the next chunk.
+    """
+
+    def __init__(self, track):
+        self.channels = track.channels
+        self.width = (track.bits_per_sample + 7) // 8
+        self.scale = float(1 << (track.bits_per_sample - 1))
+        self.in_data = False
+        self._header = b''
+        self._pending = b''
+
+    def pcm(self, data):
+        """Return the PCM bytes in `data`, consuming RIFF chunks up to the 'data' chunk first."""
+        if self.in_data:
+            return data
+        self._header += data
+        pos = 12
+        while len(self._header) >= pos + 8:
+            chunk_id = self._header[pos:pos + 4]
+            size = int.from_bytes(self._header[pos + 4:pos + 8], 'little')
+            if chunk_id == b'data':
+                self.in_data = True
+                pcm, self._header = self._header[pos + 8:], b''
+                return pcm
+            pos += 8 + size + (size & 1)
+        return b''
+
+    def to_float(self, pcm):
+        """Little-endian integer PCM -> (frames, channels) floats in [-1, 1)."""
+        data = self._pending + pcm
+        frame = self.width * self.channels
+        usable = len(data) - len(data) % frame
+        self._pending = data[usable:]
+        raw = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, self.width)
+        if self.width == 1:
+            samples = raw[:, 0].astype(np.int32) - 128
+        else:
+            samples = np.zeros(len(raw), dtype=np.int64)
+            for i in range(self.width):
+                samples |= raw[:, i].astype(np.int64) << (8 * i)
+            sign = 1 << (8 * self.width - 1)
+            samples = (samples ^ sign) - sign
+        return samples.reshape(-1, self.channels) / self.scale
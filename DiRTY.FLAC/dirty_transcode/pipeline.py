@@ -0,0 +1,172 @@
+"""Album stages scheduled across albums with a shared CPU budget."""
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from . import config
+from .governor import LoadGovernor, govern_thread
+
+
+class CpuBudget:
+    """Counting semaphore shared by every CPU-bound stage (track encodes and hash threads)."""
+
+    def __init__(self, slots):
+        self._cond = threading.Condition()
+        self.slots = max(1, slots)
+        self.used = 0
+
+    def acquire(self, n=1):
+        with self._cond:
+            n = min(n, self.slots)
+            while self.used + n > self.slots:
+                self._cond.wait()
+            self.used += n
+            return n
+
+    def release(self, n=1):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+    def resize(self, slots):
+        """Change the slot count; holders over a smaller budget finish, new acquires wait for room."""
+        with self._cond:
+            self.slots = max(1, slots)
+            self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, n=1):
+        n = self.acquire(n)
+        try:
+            yield n
+        finally:
+            self.release(n)
+
+
+class PipelineScheduler:
+    """Stage queues shared by all albums, so CPU and disk work overlap across albums.
+
+    - encode: CPU-bound track pipelines, one budget slot each (or leased
+      to --worker processes when a RemoteEncoder is given)
+    - io: image copies and source deletes
+    - verify: output checks that gate torrents and source deletes
+    - checksum: mmap'd MD5/CRC32 of outputs for the .md5/.sfv manifests
+    - hash: torrent hashing, holding as many budget slots as hash threads
+    - album: per-album coordinators; ALBUMS_IN_FLIGHT of them let the next
+      album read its manifest and queue encodes while the previous one is
+      still copying, hashing and cleaning up
+    """
+
+    def __init__(self, jobs=config.JOBS, io_workers=config.IO_WORKERS, albums_in_flight=config.ALBUMS_IN_FLIGHT,
+                 verify_workers=config.VERIFY_WORKERS, checksum_workers=config.CHECKSUM_WORKERS, remote=None):
+        self.budget = CpuBudget(jobs)
+        self.hash_threads = max(1, jobs // 4)
+
+        def pool(workers, name):
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name, initializer=govern_thread)
+
+        self._encode = pool(max(1, jobs), 'encode')
+        self._io = pool(io_workers, 'io')
+        self._verify = pool(verify_workers, 'verify')
+        self._checksum = pool(checksum_workers, 'checksum')
+        self._hash = pool(1, 'hash')
+        self._albums = pool(albums_in_flight, 'album')
+        self.governor = None
+        if config.MAX_LOAD is not None or config.CPU_TARGET is not None:
+            self.governor = LoadGovernor(self.budget, self.budget.slots, config.MAX_LOAD, config.CPU_TARGET)
+        self._lock = threading.Lock()
+        self._pending = []
+        self.failures = 0
+        self.remote = remote
+
+    def _cpu(self, slots, func, *args):
+        with self.budget.hold(slots):
+            return func(*args)
+
+    def _track(self, future):
+        with self._lock:
+            # Finished jobs have printed their outcome; only count the failures
+            for f in self._pending:
+                if f.done() and f.exception():
+                    print(f"Pipeline job failed: {f.exception()}")
+                    self.failures += 1
+                elif f.done() and f.result() is False:
+                    self.failures += 1
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+        return future
+
+    def encode(self, func, *args):
+        if self.remote:
+            return self.remote.submit(func, *args)
+        return self._encode.submit(self._cpu, 1, func, *args)
+
+    def io(self, func, *args):
+        return self._track(self._io.submit(func, *args))
+
+    def verify(self, func, *args):
+        return self._verify.submit(func, *args)
+
+    def checksum(self, func, *args):
+        return self._checksum.submit(func, *args)
+
+    def hash(self, func, *args):
+        return self._track(self._hash.submit(self._cpu, self.hash_threads, func, *args))
+
+    def album(self, func, *args):
+        return self._track(self._albums.submit(func, *args))
+
+    def wait(self):
+        """Block until every queued album and stage job is done; True if none failed."""
+        while True:
+            with self._lock:
+                pending = [f for f in self._pending if not f.done()]
+            if not pending:
+                break
+            wait(pending)
+        with self._lock:
+            for f in self._pending:
+                if f.exception():
+                    print(f"Pipeline job failed: {f.exception()}")
+                    self.failures += 1
+                elif f.result() is False:
+                    self.failures += 1
+            self._pending = []
+            failures, self.failures = self.failures, 0
+        return failures == 0
+
+    def shutdown(self):
+        self.wait()
+        for pool in (self._albums, self._encode, self._verify, self._checksum, self._io, self._hash):
+            pool.shutdown()
+        if self.governor:
+            self.governor.stop()
+        if self.remote:
+            self.remote.close()
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler(jobs=config.JOBS, remote=None):
+    """Process-wide scheduler, created on first use with a CPU budget of `jobs`."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = PipelineScheduler(jobs, remote=remote)
+        return _SCHEDULER
+
+
+def current_scheduler():
+    """The process-wide scheduler, or None if nothing has started one."""
+    return _SCHEDULER
+
+
+def shutdown_scheduler():
+    """Drain and close the process-wide scheduler; the next get_scheduler() starts a fresh one."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        scheduler, _SCHEDULER = _SCHEDULER, None
+    if scheduler:
+        scheduler.shutdown()
@@ -0,0 +1,379 @@
+"""Coordinator and worker mode: track encodes leased over TCP."""
+import os
+import json
+import time
+import base64
+import socket
+import itertools
+import socketserver
+import platform
+import threading
+from pathlib import Path
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import Future
+
+from . import config
+from .art import AlbumArt
+from .encode import _LEASE, WorkerLease, transcode_track
+from .events import cancelled
+from .governor import govern_thread
+from .journal import preset_key
+from .lazy import np
+from .manifest import Loudness, TrackInfo
+from .spectral import Spectrum
+
+
+def parse_address(value):
+    """'host:port' or ':port' / 'port' (this machine only) -> (host, port).
+
+    The protocol has no authentication, so listening on other interfaces has to be asked for by host.
+    """
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def send_message(wfile, lock, **message):
+    data = (json.dumps(message) + '\n').encode()
+    with lock:
+        wfile.write(data)
+        wfile.flush()
+
+
+def read_message(rfile):
+    line = rfile.readline()
+    return json.loads(line) if line else None
+
+
+def pack_array(array):
+    return {'dtype': str(array.dtype), 'shape': list(array.shape), 'data': base64.b64encode(array.tobytes()).decode()}
+
+
+def unpack_array(packed):
+    return np.frombuffer(base64.b64decode(packed['data']), dtype=packed['dtype']).reshape(packed['shape'])
+
+
+def track_to_wire(track):
+    return {'path': str(track.path), 'rel_path': str(track.rel_path), 'size': track.size, 'tags': track.tags,
+            'vorbis': track.vorbis, 'sample_rate': track.sample_rate, 'bits_per_sample': track.bits_per_sample,
+            'channels': track.channels, 'total_samples': track.total_samples, 'md5': track.md5}
+
+
+def track_from_wire(wire):
+    return TrackInfo(**{**wire, 'path': Path(wire['path']), 'rel_path': Path(wire['rel_path'])})
+
+
+@dataclass
+class RemoteJob:
+    """One transcode_track call waiting for, or leased to, a worker."""
+    track: TrackInfo
+    targets: dict
+    cover: AlbumArt
+    measure: bool
+    spectrals: Path
+    future: Future
+    attempts: int = 0
+    deadline: float = 0.0
+    worker: str = ''
+    token: int = 0  # of the current lease; every lease gets a new one
+
+
+class RemoteEncoder:
+    """Coordinator side of --coordinator: leases track encodes to --worker processes over TCP.
+
+    The protocol is one JSON object per line. A worker connection sends
+    'get' and receives a 'job', 'wait' or 'bye'. It may ask for the job's
+    cover 'art' by digest, sends 'renew' while encoding, and finishes with
+    'done'. Renew and done carry the lease token the job came with; once a
+    lease has expired and the job was handed out again, its old token is
+    refused on renew and ignored on done. Sources and outputs are read and
+    written by the workers at the same paths, so they must share the
+    filesystem layout.
+    """
+
+    def __init__(self, address):
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._leased = {}
+        self._art = {}
+        self._tokens = itertools.count(1)
+        self._connections = 0
+        self.closing = False
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._serve(self)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(address, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='coordinator', daemon=True).start()
+        threading.Thread(target=self._reap, name='lease-reaper', daemon=True).start()
+        print(f"[coordinator] Listening on {address[0]}:{self._server.server_address[1]} for workers")
+
+    def submit(self, func, track, targets, cover, measure=False, spectrals=None):
+        if func is not transcode_track:
+            raise ValueError(f"remote workers only run transcode_track, not {func.__name__}")
+        job = RemoteJob(track, dict(targets), cover, measure, spectrals, Future())
+        with self._cond:
+            if cover:
+                self._art[cover.digest] = cover
+            self._queue.append(job)
+            self._cond.notify_all()
+        return job.future
+
+    def _serve(self, handler):
+        worker = '{}:{}'.format(*handler.client_address)
+        lock = threading.Lock()
+        token = None
+        with self._cond:
+            self._connections += 1
+        try:
+            while True:
+                message = read_message(handler.rfile)
+                if message is None:
+                    break
+                op = message.get('op')
+                if op == 'hello':
+                    worker = message.get('worker', worker)
+                    print(f"[coordinator] Worker connected: {worker}")
+                elif op == 'get':
+                    job = self._next_job(worker)
+                    if job is None:
+                        send_message(handler.wfile, lock, op='bye' if self.closing else 'wait')
+                        if self.closing:
+                            break
+                        continue
+                    token = job.token
+                    send_message(handler.wfile, lock, op='job', token=token, lease=config.REMOTE_LEASE_SECONDS,
+                                 track=track_to_wire(job.track),
+                                 targets={p: str(path) for p, path in job.targets.items()},
+                                 presets={p: preset_key(p) for p in job.targets},
+                                 art={'digest': job.cover.digest} if job.cover else None,
+                                 measure=job.measure, spectrals=str(job.spectrals) if job.spectrals else None)
+                elif op == 'art':
+                    with self._cond:
+                        art = self._art.get(message['digest'])
+                    send_message(handler.wfile, lock, op='art', mime=art.mime if art else None,
+                                 data=base64.b64encode(art.data).decode() if art else None)
+                elif op == 'renew':
+                    with self._cond:
+                        leased = self._leased.get(message.get('token'))
+                        if leased:
+                            leased.deadline = time.monotonic() + config.REMOTE_LEASE_SECONDS
+                    send_message(handler.wfile, lock, op='renewed', ok=leased is not None)
+                elif op == 'done':
+                    self._finish(message, worker)
+                    token = None
+        except (OSError, ValueError) as e:
+            print(f"[coordinator] Lost worker {worker}: {e}")
+        finally:
+            with self._cond:
+                self._connections -= 1
+                self._cond.notify_all()
+            if token:
+                self._requeue(token, f"worker {worker} disconnected")
+
+    def _next_job(self, worker):
+        with self._cond:
+            deadline = time.monotonic() + config.REMOTE_POLL_SECONDS
+            while not self._queue and not self.closing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            while self._queue and cancelled():
+                job = self._queue.popleft()
+                job.future.set_result(dict.fromkeys(job.targets, False))
+            if not self._queue:
+                return None
+            job = self._queue.popleft()
+            job.attempts += 1
+            job.deadline = time.monotonic() + config.REMOTE_LEASE_SECONDS
+            job.worker = worker
+            job.token = next(self._tokens)
+            self._leased[job.token] = job
+            return job
+
+    def _finish(self, message, worker):
+        with self._cond:
+            job = self._leased.pop(message.get('token'), None)
+        if job is None:
+            # Lease already expired and the job went to someone else
+            return
+        results = {p: bool(message.get('results', {}).get(p)) for p in job.targets}
+        if message.get('error'):
+            print(f"[coordinator] {worker} failed {job.track.rel_path}: {message['error']}")
+        if not all(results.values()) and job.attempts < config.REMOTE_MAX_ATTEMPTS:
+            self._retry(job, f"{worker} reported a failed encode")
+            return
+        if message.get('loudness'):
+            job.track.loudness = Loudness(unpack_array(message['loudness']['blocks']), message['loudness']['peak'])
+        if message.get('spectrum'):
+            spectrum = message['spectrum']
+            job.track.spectrum = Spectrum(spectrum['rate'], unpack_array(spectrum['power']),
+                                          unpack_array(spectrum['preview']))
+        job.future.set_result(results)
+
+    def _requeue(self, token, reason):
+        """Take back the lease `token` if it is still current, and retry its job."""
+        with self._cond:
+            job = self._leased.pop(token, None)
+        if job:
+            self._retry(job, reason)
+
+    def _retry(self, job, reason):
+        with self._cond:
+            if job.attempts < config.REMOTE_MAX_ATTEMPTS:
+                print(f"[coordinator] Retrying {job.track.rel_path} ({reason}, attempt {job.attempts})")
+                self._queue.appendleft(job)
+                self._cond.notify_all()
+                return
+        print(f"[coordinator] Giving up on {job.track.rel_path} after {job.attempts} attempts ({reason})")
+        job.future.set_result(dict.fromkeys(job.targets, False))
+
+    def _reap(self):
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            with self._cond:
+                expired = [(token, job.worker) for token, job in self._leased.items() if job.deadline < now]
+            for token, worker in expired:
+                self._requeue(token, f"lease expired on {worker}")
+
+    def close(self):
+        """Tell idle workers to exit, then stop listening."""
+        with self._cond:
+            if self.closing:
+                return
+            self.closing = True
+            self._cond.notify_all()
+            deadline = time.monotonic() + config.REMOTE_POLL_SECONDS + 1
+            while self._connections and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_WORKER_ART = {}
+_WORKER_ART_LOCK = threading.Lock()
+
+
+def run_remote_job(message, rfile, wfile, lock):
+    """Run one leased transcode_track on this worker.
+
+    Returns the 'done' payload, or None if the coordinator revoked the
+    lease and the job was abandoned.
+    """
+    targets = {p: Path(path) for p, path in message['targets'].items()}
+    mismatched = [p for p, key in message['presets'].items() if p not in config.PRESET_FOLDERS or preset_key(p) != key]
+    if mismatched:
+        return {'results': dict.fromkeys(targets, False),
+                'error': f"preset settings differ from the coordinator's: {', '.join(mismatched)}"}
+
+    cover = None
+    if message['art']:
+        digest = message['art']['digest']
+        with _WORKER_ART_LOCK:
+            cover = _WORKER_ART.get(digest)
+        if cover is None:
+            send_message(wfile, lock, op='art', digest=digest)
+            reply = read_message(rfile)
+            if reply is None:
+                raise ConnectionError("coordinator closed the connection")
+            if reply.get('data'):
+                cover = AlbumArt(base64.b64decode(reply['data']), reply['mime'], digest, 'coordinator')
+                with _WORKER_ART_LOCK:
+                    _WORKER_ART[digest] = cover
+
+    track = track_from_wire(message['track'])
+    stop = threading.Event()
+    lease = WorkerLease()
+
+    def renew():
+        # The job thread doesn't read the connection while it encodes, so the replies are ours
+        while not stop.wait(message['lease'] / 3):
+            try:
+                send_message(wfile, lock, op='renew', token=message['token'])
+                reply = read_message(rfile)
+            except (OSError, ValueError):
+                return
+            if reply is None:
+                return
+            if not reply.get('ok'):
+                print(f"Lease on {track.rel_path} was taken back by the coordinator, abandoning it")
+                lease.revoke()
+                return
+
+    renewer = threading.Thread(target=renew, name='lease-renew', daemon=True)
+    renewer.start()
+    _LEASE.lease = lease
+    try:
+        spectrals = Path(message['spectrals']) if message['spectrals'] else None
+        results = transcode_track(track, targets, cover, message['measure'], spectrals)
+    finally:
+        _LEASE.lease = None
+        stop.set()
+        renewer.join()
+    if lease.revoked:
+        return None
+    payload = {'results': results}
+    if track.loudness:
+        payload['loudness'] = {'blocks': pack_array(track.loudness.blocks), 'peak': track.loudness.peak}
+    if track.spectrum:
+        payload['spectrum'] = {'rate': track.spectrum.rate, 'power': pack_array(track.spectrum.power),
+                               'preview': pack_array(track.spectrum.preview.astype(np.float32))}
+    return payload
+
+
+def worker_loop(address, name):
+    """One worker slot: keep taking jobs until the coordinator says bye or stays unreachable."""
+    govern_thread()
+    gone_since = None
+    while True:
+        try:
+            with socket.create_connection(address) as sock:
+                rfile, wfile = sock.makefile('rb'), sock.makefile('wb')
+                lock = threading.Lock()
+                send_message(wfile, lock, op='hello', worker=name)
+                gone_since = None
+                while True:
+                    send_message(wfile, lock, op='get')
+                    message = read_message(rfile)
+                    if message is None:
+                        raise ConnectionError("coordinator closed the connection")
+                    if message['op'] == 'bye':
+                        return
+                    if message['op'] != 'job':
+                        continue
+                    try:
+                        payload = run_remote_job(message, rfile, wfile, lock)
+                    except OSError:
+                        raise
+                    except Exception as e:
+                        payload = {'results': dict.fromkeys(message['targets'], False), 'error': str(e)}
+                    if payload is not None:
+                        send_message(wfile, lock, op='done', token=message['token'], **payload)
+        except OSError as e:
+            now = time.monotonic()
+            if gone_since is None:
+                print(f"[{name}] Coordinator unreachable ({e}), retrying for {config.WORKER_RECONNECT_SECONDS}s")
+                gone_since = now
+            elif now - gone_since > config.WORKER_RECONNECT_SECONDS:
+                print(f"[{name}] Giving up on the coordinator")
+                return
+            time.sleep(2)
+
+
+def run_worker(address, jobs):
+    """--worker: run `jobs` encode slots for the coordinator at `address`."""
+    print(f"[worker] Serving {address[0]}:{address[1]} with {jobs} slots")
+    node = f"{platform.node()}:{os.getpid()}"
+    slots = [threading.Thread(target=worker_loop, args=(address, f"{node}/{n}"), name=f"worker_{n}")
+             for n in range(jobs)]
+    for slot in slots:
+        slot.start()
+    for slot in slots:
+        slot.join()
+    print("[worker] Coordinator finished, exiting.")
@@ -0,0 +1,182 @@
+"""ReplayGain 2.0 (EBU R128 / BS.1770) measured from the decoded PCM."""
+import math
+from functools import lru_cache
+
+from . import config
+from .events import stage_timer
+from .journal import get_journal
+from .lazy import np
+from .manifest import Loudness, output_file
+from .pcm import WavStream
+from .tags import MP3_FRAME_TEXTS
+
+
+@lru_cache(maxsize=None)
+def k_weighting(sample_rate, block=config.LOUDNESS_BLOCK):
+    """FFT of the BS.1770 K-weighting filter (shelf + high-pass) impulse response at `sample_rate`.
+
+    Returns (spectrum, FFT size, impulse response length) for overlap-add
+    filtering of `block`-frame blocks.
+    """
+    # Pre-filter high shelf and RLB high-pass, with coefficients derived for any rate (as libebur128 does)
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ((vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass = (1.0, -2.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+
+    length = max(64, int(sample_rate * config.KWEIGHT_SECONDS))
+    h = [1.0] + [0.0] * (length - 1)
+    for b0, b1, b2, a1, a2 in (shelf, highpass):
+        x1 = x2 = y1 = y2 = 0.0
+        for i, x in enumerate(h):
+            y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+            x2, x1, y2, y1 = x1, x, y1, y
+            h[i] = y
+    nfft = 1 << (block + length - 2).bit_length()
+    return np.fft.rfft(np.array(h), nfft), nfft, length
+
+
+class LoudnessMeter:
+    """EBU R128 loudness of one track, fed the same decoded WAV chunks as the encoders.
+
+    K-weighting is applied by FFT overlap-add, and the weighted power is
+    kept per 100 ms segment so 400 ms gating blocks (75% overlap) can be
+    formed for the track, or pooled across an album.
+    """
+
+    def __init__(self, track):
+        self.wav = WavStream(track)
+        self.peak = 0.0
+        self._spectrum, self._nfft, length = k_weighting(track.sample_rate)
+        self._input = np.zeros((0, track.channels))
+        self._tail = np.zeros((length - 1, track.channels))
+        # BS.1770 channel weights: LFE ignored and surrounds +1.5 dB for 5.1
+        self._weights = np.ones(track.channels)
+        if track.channels == 6:
+            self._weights = np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+        self._segment = max(1, track.sample_rate // 10)
+        self._power = np.zeros(0)
+        self._segments = []
+
+    def write(self, data):
+        pcm = self.wav.pcm(data)
+        if not pcm:
+            return
+        x = self.wav.to_float(pcm)
+        if len(x):
+            self.peak = max(self.peak, float(np.abs(x).max()))
+        self._input = np.concatenate((self._input, x))
+        while len(self._input) >= config.LOUDNESS_BLOCK:
+            self._filter(self._input[:config.LOUDNESS_BLOCK])
+            self._input = self._input[config.LOUDNESS_BLOCK:]
+
+    def close(self):
+        if len(self._input):
+            self._filter(self._input)
+            self._input = self._input[:0]
+
+    def _filter(self, x):
+        y = np.fft.irfft(np.fft.rfft(x, self._nfft, axis=0) * self._spectrum[:, None], self._nfft, axis=0)
+        n, overlap = len(x), len(self._tail)
+        y[:overlap] += self._tail
+        out = y[:n]
+        self._tail = y[n:n + overlap]
+        power = np.concatenate((self._power, (out * out) @ self._weights))
+        whole = len(power) // self._segment * self._segment
+        if whole:
+            self._segments.append(power[:whole].reshape(-1, self._segment).mean(axis=1))
+        self._power = power[whole:]
+
+    def result(self):
+        """Mean-square energy of every 400 ms block, plus the sample peak."""
+        segments = np.concatenate(self._segments) if self._segments else np.zeros(0)
+        if len(segments) < 4:
+            return Loudness(np.zeros(0), self.peak)
+        blocks = (segments[:-3] + segments[1:-2] + segments[2:-1] + segments[3:]) / 4
+        return Loudness(blocks, self.peak)
+
+
+def gated_loudness(blocks):
+    """Integrated loudness in LUFS with the -70 LUFS absolute and -10 LU relative gates."""
+    blocks = blocks[blocks > 10 ** ((-70 + 0.691) / 10)]
+    if not len(blocks):
+        return None
+    relative = -0.691 + 10 * math.log10(blocks.mean()) - 10
+    blocks = blocks[blocks > 10 ** ((relative + 0.691) / 10)]
+    return -0.691 + 10 * math.log10(blocks.mean())
+
+
+def replaygain_tags(scope, measurements):
+    """REPLAYGAIN_<scope>_GAIN/PEAK values for one track's or a whole album's measurements."""
+    loudness = gated_loudness(np.concatenate([m.blocks for m in measurements]))
+    if loudness is None:
+        return {}
+    return {
+        f'REPLAYGAIN_{scope}_GAIN': f"{config.REPLAYGAIN_REFERENCE - loudness:+.2f} dB",
+        f'REPLAYGAIN_{scope}_PEAK': f"{max(m.peak for m in measurements):.6f}",
+    }
+
+
+def needs_replaygain(manifest):
+    """Measure an album unless every track already carries track and album gain."""
+    if not config.REPLAYGAIN or not manifest.tracks:
+        return False
+    if any(not {'REPLAYGAIN_TRACK_GAIN', 'REPLAYGAIN_ALBUM_GAIN'} <= t.tags.keys() for t in manifest.tracks):
+        if np is None:
+            print("numpy is not installed; ReplayGain will not be computed.")
+            return False
+        return True
+    return False
+
+
+def add_replaygain_tags(out_file, tags):
+    """Add gain tags to an already tagged MP3 or FLAC, leaving its other tags alone."""
+    from mutagen.flac import FLAC
+    from mutagen.id3 import ID3, TXXX
+    try:
+        if out_file.suffix == '.flac':
+            audio = FLAC(out_file)
+            for key, value in tags.items():
+                audio[key] = value
+            audio.save()
+        else:
+            id3 = ID3(out_file)
+            for key, value in tags.items():
+                id3.delall(f'TXXX:{MP3_FRAME_TEXTS.get(key, key)}')
+                id3.add(TXXX(encoding=3, desc=MP3_FRAME_TEXTS.get(key, key), text=value))
+            id3.save(v2_version=3)
+        return True
+    except Exception as e:
+        print(f"Error writing ReplayGain tags to {out_file}: {e}")
+        return False
+
+
+def write_album_gain(manifest, targets, track_results):
+    """Tag every output of the album with the album gain pooled from its tracks' measurements."""
+    measured = [t.loudness for t in manifest.tracks]
+    if not all(measured):
+        print(f"Album gain skipped for {manifest.folder.name}: not every track could be measured")
+        return
+    tags = replaygain_tags('ALBUM', measured)
+    if not tags:
+        return
+    print(f"Album gain for {manifest.folder.name}: {tags['REPLAYGAIN_ALBUM_GAIN']}")
+    with stage_timer('replaygain', album=manifest.folder.name) as ev:
+        journal = get_journal()
+        written = 0
+        for track, result in zip(manifest.tracks, track_results):
+            for preset, output_path in targets.items():
+                out_file = output_file(output_path, track, preset)
+                if result[preset] and add_replaygain_tags(out_file, tags):
+                    written += 1
+                    # The tags changed the size the journal recorded
+                    if journal:
+                        journal.mark(track.md5, preset, out_file, 'done', out_file.stat().st_size)
+        ev['files'] = written
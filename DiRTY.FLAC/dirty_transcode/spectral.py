@@ -0,0 +1,170 @@
+"""Optional lossy-source check: spectrograms and brickwall lowpass detection."""
+import struct
+import zlib
+from pathlib import Path
+from collections import namedtuple
+
+from . import config
+from .events import stage_timer
+from .lazy import np
+from .pcm import WavStream
+
+Spectrum = namedtuple('Spectrum', 'rate power preview')
+
+
+class SpectrumAnalyzer:
+    """Mono spectrogram and long-term spectrum of one track, fed from the PCM tee.
+
+    Each spectrogram column averages the Hann-windowed FFT power of enough
+    frames that a whole track fits in SPECTROGRAM_WIDTH columns.
+    """
+
+    def __init__(self, track):
+        self.wav = WavStream(track)
+        self.rate = track.sample_rate
+        per_column = max(1, -(-track.total_samples // (config.SPECTRAL_FFT * config.SPECTROGRAM_WIDTH)))
+        self._per_column = per_column
+        self._window = np.hanning(config.SPECTRAL_FFT)
+        # Full-scale sine -> 0 dB
+        self._norm = 4 / self._window.sum() ** 2
+        self._buffer = np.zeros(0)
+        self._columns = []
+        self._power = np.zeros(config.SPECTRAL_FFT // 2 + 1)
+        self._frames = 0
+
+    def write(self, data):
+        pcm = self.wav.pcm(data)
+        if not pcm:
+            return
+        self._buffer = np.concatenate((self._buffer, self.wav.to_float(pcm).mean(axis=1)))
+        hop = self._per_column * config.SPECTRAL_FFT
+        count = len(self._buffer) // hop
+        if count:
+            self._add(self._buffer[:count * hop], count)
+            self._buffer = self._buffer[count * hop:]
+
+    def close(self):
+        frames = len(self._buffer) // config.SPECTRAL_FFT
+        if frames:
+            self._per_column = frames
+            self._add(self._buffer[:frames * config.SPECTRAL_FFT], 1)
+        self._buffer = self._buffer[:0]
+
+    def _add(self, x, columns):
+        frames = x.reshape(-1, config.SPECTRAL_FFT) * self._window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2 * self._norm
+        self._power += power.sum(axis=0)
+        self._frames += len(power)
+        self._columns.append(power.reshape(columns, -1, power.shape[1]).mean(axis=1))
+
+    def columns(self):
+        return np.concatenate(self._columns) if self._columns else np.zeros((0, config.SPECTRAL_FFT // 2 + 1))
+
+    def result(self):
+        """Long-term spectrum and a narrow spectrogram preview for the album image."""
+        power = self._power / self._frames if self._frames else self._power
+        return Spectrum(self.rate, power, fit_columns(self.columns(), config.SPECTROGRAM_WIDTH // 8))
+
+
+def fit_columns(columns, width):
+    """Average groups of spectrogram columns down to at most `width`."""
+    if len(columns) <= width:
+        return columns
+    edges = np.linspace(0, len(columns), width + 1).astype(int)
+    return np.add.reduceat(columns, edges[:-1], axis=0) / np.diff(edges)[:, None]
+
+
+def spectral_cutoff(spectrum):
+    """(cutoff Hz, brickwall?) from a long-term power spectrum."""
+    bins = len(spectrum.power)
+    freqs = np.arange(bins) * spectrum.rate / config.SPECTRAL_FFT
+    db = 10 * np.log10(spectrum.power + 1e-20)
+    width = max(1, round(150 / (spectrum.rate / config.SPECTRAL_FFT)))
+    db = np.convolve(db, np.ones(width) / width, mode='same')
+    reference = np.median(db[(freqs >= 1000) & (freqs <= 8000)])
+    above = np.nonzero(db[:bins - width] > reference - config.SPECTRAL_FLOOR_DB)[0]
+    if not len(above):
+        return 0.0, False
+    cutoff = freqs[above[-1]]
+    below = db[(freqs >= cutoff - 1000) & (freqs <= cutoff - 300)]
+    over = db[(freqs >= cutoff + 300) & (freqs <= cutoff + 1000)]
+    steep = len(below) > 0 and len(over) > 0 and below.mean() - over.mean() >= config.SPECTRAL_STEP_DB
+    return float(cutoff), bool(steep)
+
+
+def spectral_verdict(spectrum):
+    """Human-readable finding, or None if the track looks full-bandwidth."""
+    cutoff, steep = spectral_cutoff(spectrum)
+    if not steep:
+        return None
+    if cutoff < config.LOSSY_CUTOFF_HZ:
+        return f"lowpass at {cutoff / 1000:.1f} kHz, possible lossy source"
+    if spectrum.rate > 48000 and cutoff <= 24500:
+        return f"lowpass at {cutoff / 1000:.1f} kHz, possibly upsampled from 44.1/48 kHz"
+    return None
+
+
+def spectrogram_png(columns, rate):
+    """Render (time, frequency) power columns as a PNG, low frequencies at the bottom, 2 kHz grid."""
+    power = columns[:, :config.SPECTRAL_FFT // 2]
+    group = max(1, power.shape[1] // config.SPECTROGRAM_HEIGHT)
+    power = power[:, :power.shape[1] // group * group].reshape(len(power), -1, group).mean(axis=2)
+    level = np.clip(1 + 10 * np.log10(power.T[::-1] + 1e-20) / config.SPECTROGRAM_DB_RANGE, 0, 1)
+    stops = [0, 0.2, 0.4, 0.6, 0.8, 1]
+    palette = [(0, 0, 0), (0, 0, 128), (128, 0, 160), (230, 30, 30), (255, 200, 0), (255, 255, 255)]
+    rgb = np.stack([np.interp(level, stops, [c[i] for c in palette]) for i in range(3)], axis=-1)
+    hz_per_row = rate / 2 / len(level)
+    for hz in range(2000, rate // 2, 2000):
+        row = len(level) - 1 - int(hz / hz_per_row)
+        rgb[row] = np.maximum(rgb[row], 70)
+    return png_bytes(rgb.astype(np.uint8))
+
+
+def png_bytes(rgb):
+    """Encode an (height, width, 3) uint8 array as a PNG, without an imaging library."""
+    height, width, _ = rgb.shape
+    raw = b''.join(b'\x00' + rgb[y].tobytes() for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+
+def spectral_folder(flac_folder):
+    return config.OUTPUT_DIR / f"{Path(flac_folder).name} (Spectrals)"
+
+
+def write_track_spectral(track, analyzer, folder):
+    """Save one track's spectrogram and report its verdict; returns its Spectrum."""
+    spectrum = analyzer.result()
+    with stage_timer('spectrals', album=track.path.parent.name, item=str(track.rel_path)) as ev:
+        png_file = folder / track.rel_path.with_suffix('.png')
+        png_file.parent.mkdir(parents=True, exist_ok=True)
+        png_file.write_bytes(spectrogram_png(analyzer.columns(), spectrum.rate))
+        cutoff, _ = spectral_cutoff(spectrum)
+        verdict = spectral_verdict(spectrum)
+        ev.update(cutoff=cutoff, verdict=verdict, bytes_out=png_file.stat().st_size)
+    if verdict:
+        print(f"Spectral warning: {track.rel_path}: {verdict}")
+    return spectrum
+
+
+def write_album_spectral(manifest, folder):
+    """Album spectrogram from the tracks' previews, plus a summary of flagged tracks."""
+    spectra = [(t, t.spectrum) for t in manifest.tracks if t.spectrum is not None]
+    if not spectra:
+        return
+    with stage_timer('spectrals', album=manifest.folder.name) as ev:
+        columns = fit_columns(np.concatenate([s.preview for _, s in spectra]), config.SPECTROGRAM_WIDTH)
+        png_file = folder / f"{manifest.folder.name}.png"
+        png_file.write_bytes(spectrogram_png(columns, spectra[0][1].rate))
+        flagged = [(t, spectral_verdict(s)) for t, s in spectra]
+        flagged = [(t, v) for t, v in flagged if v]
+        ev.update(tracks=len(spectra), flagged=len(flagged), bytes_out=png_file.stat().st_size)
+    if flagged:
+        print(f"Spectral check for {manifest.folder.name}: {len(flagged)} of {len(spectra)} tracks flagged, "
+              f"review {folder}")
+    else:
+        print(f"Spectral check for {manifest.folder.name}: no lossy cutoffs found ({folder})")
@@ -0,0 +1,197 @@
+"""Reading FLAC tags and writing ID3 and Vorbis tags with the album art."""
+import re
+from pathlib import Path
+
+from .events import vprint
+
+# Mapping of FLAC tags to MP3 ID3 frames
+MP3_FRAMES = {
+    'ALBUM': 'TALB',
+    'ALBUMARTIST': 'TPE2',
+    'ARTIST': 'TPE1',
+    'BAND': 'TPE2',
+    'BPM': 'TBPM',
+    'COMMENT': 'COMM',
+    'COMPILATION': 'TCMP',
+    'COMPOSER': 'TCOM',
+    'CONDUCTOR': 'TPE3',
+    'DATE': 'TYER',
+    'DISCNUMBER': 'TPOS',
+    'GENRE': 'TCON',
+    'ISRC': 'TSRC',
+    'LYRICIST': 'TEXT',
+    'PUBLISHER': 'TPUB',
+    'TITLE': 'TIT2',
+    'TRACKNUMBER': 'TRCK',
+    'MUSICBRAINZ_ALBUMID': 'TXXX',
+    'MUSICBRAINZ_ALBUMSTATUS': 'TXXX',
+    'MUSICBRAINZ_ALBUMTYPE': 'TXXX',
+    'MUSICBRAINZ_ARTISTID': 'TXXX',
+    'MUSICBRAINZ_SORTNAME': 'TXXX',
+    'MUSICBRAINZ_TRACKID': 'UFID',
+    'MUSICBRAINZ_TRMID': 'TXXX',
+    'MD5': 'TXXX',
+    'REPLAYGAIN_TRACK_PEAK': 'TXXX',
+    'REPLAYGAIN_TRACK_GAIN': 'TXXX',
+    'REPLAYGAIN_ALBUM_PEAK': 'TXXX',
+    'REPLAYGAIN_ALBUM_GAIN': 'TXXX',
+}
+
+MP3_FRAME_TEXTS = {
+    'COMMENT': '',
+    'MD5': 'MD5',
+    'MUSICBRAINZ_ALBUMARTISTID': 'MusicBrainz Album Artist Id',
+    'MUSICBRAINZ_ALBUMID': 'MusicBrainz Album Id',
+    'MUSICBRAINZ_ALBUMSTATUS': 'MusicBrainz Album Status',
+    'MUSICBRAINZ_ALBUMTYPE': 'MusicBrainz Album Type',
+    'MUSICBRAINZ_ARTISTID': 'MusicBrainz Artist Id',
+    'MUSICBRAINZ_SORTNAME': 'MusicBrainz Sortname',
+    'MUSICBRAINZ_TRACKID': 'MusicBrainz Trackid',
+    'MUSICBRAINZ_TRMID': 'MusicBrainz TRM Id',
+    'REPLAYGAIN_TRACK_PEAK': 'REPLAYGAIN_TRACK_PEAK',
+    'REPLAYGAIN_TRACK_GAIN': 'REPLAYGAIN_TRACK_GAIN',
+    'REPLAYGAIN_ALBUM_PEAK': 'REPLAYGAIN_ALBUM_PEAK',
+    'REPLAYGAIN_ALBUM_GAIN': 'REPLAYGAIN_ALBUM_GAIN',
+}
+
+
+def read_flac_tags(audio):
+    """Collect the Vorbis comments and STREAMINFO MD5 of an opened FLAC."""
+    tags = {}
+    if audio.tags:
+        for k, v in audio.tags:
+            tags[k.upper()] = v[0] if isinstance(v, list) and v else str(v)
+
+    # Get MD5 checksum
+    tags['MD5'] = audio.info.md5_signature.to_bytes(16, 'big').hex().upper()
+    return tags
+
+
+def preprocess_flac_tags(tags, flac_folder):
+    tags_to_update = {}
+    for frame, value in tags.items():
+        if frame in MP3_FRAMES:
+            if isinstance(value, list):
+                value = '/'.join(str(v) for v in value if v)
+            if value:
+                tags_to_update[frame] = str(value).strip()
+
+    # Ensure ALBUM and TITLE are present
+    folder_name = Path(flac_folder).name
+    if 'ALBUM' not in tags_to_update or not tags_to_update.get('ALBUM'):
+        match = re.match(r'.*?-\s*(.*?)\s*\(\d{4}\)\s*\[FLAC\]', folder_name)
+        album_name = match.group(1) if match else folder_name.replace('[FLAC]', '').strip()
+        tags_to_update['ALBUM'] = album_name
+        print(f"Warning: ALBUM tag missing or empty, using folder-derived name: {album_name}")
+    if 'TITLE' not in tags_to_update or not tags_to_update.get('TITLE'):
+        filename = Path(tags.get('FILEPATH', 'Unknown')).stem
+        filename = re.sub(r'^\d+\s*[.-]\s*', '', filename)
+        tags_to_update['TITLE'] = filename
+        print(f"Warning: TITLE tag missing or empty, using filename: {filename}")
+
+    # Fix track number
+    if 'TRACKNUMBER' in tags_to_update:
+        track_num = tags_to_update['TRACKNUMBER']
+        try:
+            track_num = int(track_num)
+            tags_to_update['TRACKNUMBER'] = f"{track_num:02d}"
+        except ValueError:
+            print(f"Non-numeric TRACKNUMBER: {track_num}")
+            tags_to_update['TRACKNUMBER'] = '01'  # Fallback
+
+    return tags_to_update
+
+
+def write_mp3_tags(mp3_file, tags_to_update, cover=None):
+    """Write text frames and the optional AlbumArt cover in a single save."""
+    from mutagen.mp3 import MP3
+    from mutagen.id3 import (ID3, TIT2, TPE1, TPE2, TPE3, TALB, TCMP, TCOM, TCON, TRCK, TPOS, TYER, TSRC, TPUB,
+                             COMM, TEXT, TBPM, TXXX, UFID, APIC, PictureType)
+    try:
+        mp3 = MP3(mp3_file, ID3=ID3)
+        if mp3.tags is None:
+            mp3.add_tags()
+
+        # Clear existing ID3 tags
+        mp3.tags.clear()
+
+        for frame, value in tags_to_update.items():
+            if frame not in MP3_FRAMES:
+                continue
+
+            frame_id = MP3_FRAMES[frame]
+            frame_text = MP3_FRAME_TEXTS.get(frame, '')
+
+            vprint(f"Writing {frame_id} ({frame}): {value}")
+
+            if frame_id == 'TIT2':
+                mp3.tags.add(TIT2(encoding=3, text=value))
+            elif frame_id == 'COMM':
+                mp3.tags.add(COMM(encoding=3, lang='eng', desc=frame_text, text=value))
+            elif frame_id == 'TXXX':
+                mp3.tags.add(TXXX(encoding=3, desc=frame_text or frame, text=value))
+            elif frame_id == 'UFID':
+                mp3.tags.add(UFID(owner=frame_text, data=value.encode()))
+            elif frame_id == 'TPE1':
+                mp3.tags.add(TPE1(encoding=3, text=value))
+            elif frame_id == 'TPE2':
+                mp3.tags.add(TPE2(encoding=3, text=value))
+            elif frame_id == 'TPE3':
+                mp3.tags.add(TPE3(encoding=3, text=value))
+            elif frame_id == 'TALB':
+                mp3.tags.add(TALB(encoding=3, text=value))
+            elif frame_id == 'TCMP':
+                mp3.tags.add(TCMP(encoding=3, text=value))
+            elif frame_id == 'TCOM':
+                mp3.tags.add(TCOM(encoding=3, text=value))
+            elif frame_id == 'TCON':
+                mp3.tags.add(TCON(encoding=3, text=value))
+            elif frame_id == 'TRCK':
+                mp3.tags.add(TRCK(encoding=3, text=value))
+            elif frame_id == 'TPOS':
+                mp3.tags.add(TPOS(encoding=3, text=value))
+            elif frame_id == 'TYER':
+                mp3.tags.add(TYER(encoding=3, text=value))
+            elif frame_id == 'TSRC':
+                mp3.tags.add(TSRC(encoding=3, text=value))
+            elif frame_id == 'TPUB':
+                mp3.tags.add(TPUB(encoding=3, text=value))
+            elif frame_id == 'TEXT':
+                mp3.tags.add(TEXT(encoding=3, text=value))
+            elif frame_id == 'TBPM':
+                mp3.tags.add(TBPM(encoding=3, text=value))
+
+        if cover:
+            mp3.tags.add(APIC(encoding=3, mime=cover.mime, type=PictureType.COVER_FRONT,
+                              desc='Cover (front)', data=cover.data))
+            vprint(f"Writing APIC (cover): {len(cover.data)} bytes")
+
+        mp3.save(v2_version=3)
+        vprint(f"Tags written to {mp3_file}")
+        return True
+    except Exception as e:
+        print(f"Error writing tags to {mp3_file}: {e}")
+        return False
+
+
+def write_flac_tags(flac_file, vorbis, cover=None):
+    """Copy the source Vorbis comments and the album cover to an output FLAC in a single save."""
+    from mutagen.flac import FLAC, Picture
+    from mutagen.id3 import PictureType
+    try:
+        audio = FLAC(flac_file)
+        for key, values in vorbis.items():
+            audio[key] = values
+        if cover:
+            picture = Picture()
+            picture.type = PictureType.COVER_FRONT
+            picture.mime = cover.mime
+            picture.desc = 'Cover (front)'
+            picture.data = cover.data
+            audio.add_picture(picture)
+        audio.save()
+        vprint(f"Tags written to {flac_file}")
+        return True
+    except Exception as e:
+        print(f"Error writing tags to {flac_file}: {e}")
+        return False
@@ -0,0 +1,111 @@
+"""Torrent hashing with torf, once per output folder."""
+from pathlib import Path
+
+from . import config
+from .deviceio import get_device_io
+from .events import stage_timer
+from .index import index_album
+from .lazy import torf
+
+
+def torrent_piece_size(total_size):
+    """Smallest power-of-two piece size giving at most TORRENT_TARGET_PIECES pieces, within bounds."""
+    piece_size = config.TORRENT_MIN_PIECE_SIZE
+    while piece_size < config.TORRENT_MAX_PIECE_SIZE and total_size / piece_size > config.TORRENT_TARGET_PIECES:
+        piece_size *= 2
+    return piece_size
+
+
+def torrent_file_path(tracker_name, folder_name):
+    return config.TORRENT_DIR / f"{tracker_name.replace(' ', '_')}_{folder_name.replace(' ', '_')}.torrent"
+
+
+def load_matching_torrent(torrent_path, folder_path):
+    """Return an existing torrent for `folder_path` if its content is unchanged since it was written."""
+    torrent_path = Path(torrent_path)
+    if not torrent_path.is_file():
+        return None
+    try:
+        existing = torf.Torrent.read(torrent_path)
+    except torf.TorfError:
+        return None
+    if existing.name != folder_path.name:
+        return None
+    index = index_album(folder_path)
+    if index.signature()[2] > torrent_path.stat().st_mtime:
+        return None
+    expected = {Path(*f.parts[1:]): f.size for f in existing.files}
+    actual = {f.rel_path: f.size for f in index.files}
+    return existing if expected == actual else None
+
+
+def hash_folder(folder_path, threads=config.JOBS, reuse=()):
+    """Piece-hash `folder_path` once, or take the pieces of an up-to-date torrent in `reuse`."""
+    folder_path = Path(folder_path)
+    for torrent_path in reuse:
+        existing = load_matching_torrent(torrent_path, folder_path)
+        if existing:
+            print(f"Reusing piece hashes from {torrent_path}")
+            return existing
+
+    torrent = torf.Torrent(path=folder_path, private=True)
+    torrent.piece_size = torrent_piece_size(torrent.size)
+    print(f"Hashing {folder_path} ({torrent.size} bytes, "
+          f"{torrent.piece_size // 1024} KiB pieces, {threads} hash threads)")
+
+    def progress(_torrent, _path, pieces_done, pieces_total):
+        print(f"Hashing {folder_path.name}: {pieces_done}/{pieces_total} pieces "
+              f"({100 * pieces_done // max(pieces_total, 1)}%)")
+
+    with stage_timer('torrent_hash', album=folder_path.name, threads=threads, bytes_in=torrent.size):
+        torrent.generate(threads=threads, callback=progress, interval=2)
+    return torrent
+
+
+def write_torrent(hashed, torrent_path, urls, source=None):
+    """Write a copy of a hashed torrent with its own announce list and source field."""
+    torrent = hashed.copy()
+    torrent.trackers = [urls]
+    torrent.private = True
+    torrent.source = source
+    torrent.write(torrent_path, overwrite=True)
+    print(f"Torrent written: {torrent_path}")
+
+
+def create_torrent(folder_path, torrent_path, trackers, threads=config.JOBS):
+    """One private torrent announcing to every tracker in `trackers`.
+
+    With a single tracker this is the same torrent per-tracker mode writes, source field included.
+    """
+    source = trackers[0].get('source', trackers[0]['name']) if len(trackers) == 1 else None
+    try:
+        hashed = hash_folder(folder_path, threads, reuse=[torrent_path])
+        write_torrent(hashed, torrent_path, [t['url'] for t in trackers], source)
+    except torf.TorfError as e:
+        print(f"Torrent creation failed for {folder_path}: {e}")
+        return False
+    return True
+
+
+def create_tracker_torrents(folder_path, trackers, threads=config.JOBS):
+    """Hash `folder_path` once and write one torrent per tracker, each with its own announce and source."""
+    folder_path = Path(folder_path)
+    paths = {t['name']: torrent_file_path(t['name'], folder_path.name) for t in trackers}
+    try:
+        hashed = hash_folder(folder_path, threads, reuse=paths.values())
+        for tracker in trackers:
+            write_torrent(hashed, paths[tracker['name']], [tracker['url']], tracker.get('source', tracker['name']))
+    except torf.TorfError as e:
+        print(f"Torrent creation failed for {folder_path}: {e}")
+        return False
+    return True
+
+
+def torrent_job(folder_path, trackers, threads=config.JOBS, mode=config.TORRENT_MODE):
+    """Create the torrent(s) for an output folder in `mode` ('combined' or 'per-tracker')."""
+    with get_device_io().reading(folder_path):
+        if mode == 'per-tracker':
+            return create_tracker_torrents(folder_path, trackers, threads)
+        # Named after every tracker, so it never overwrites a per-tracker torrent of the first one
+        prefix = '+'.join(t['name'] for t in trackers) or "NoTracker"
+        return create_torrent(folder_path, torrent_file_path(prefix, Path(folder_path).name), trackers, threads)
@@ -0,0 +1,70 @@
+"""trackers.json: saved trackers and the interactive tracker prompts."""
+import json
+
+from . import config
+
+
+def load_trackers():
+    if config.TRACKER_FILE.exists():
+        with open(config.TRACKER_FILE, "r") as f:
+            return sorted(json.load(f), key=lambda t: t['name'].lower())
+    return []
+
+
+def save_trackers(trackers):
+    with open(config.TRACKER_FILE, "w") as f:
+        json.dump(trackers, f, indent=2)
+
+
+def add_tracker():
+    name = input("Tracker name: ").strip()
+    url = input("Announce URL: ").strip()
+    source = input("Source tag (optional, used for per-tracker torrents): ").strip()
+    trackers = load_trackers()
+    tracker = {"name": name, "url": url}
+    if source:
+        tracker["source"] = source
+    trackers.append(tracker)
+    save_trackers(trackers)
+    print(f"Tracker '{name}' added.")
+
+
+def manage_trackers():
+    while True:
+        trackers = load_trackers()
+        if not trackers:
+            print("No trackers available.")
+            return
+        print("\nManage Trackers:")
+        for i, t in enumerate(trackers, 1):
+            print(f"{i} - {t['name']} ({t['url']})")
+        print("0 - Back")
+        choice = input("Enter number to delete or 0 to go back: ").strip()
+        if choice == "0":
+            break
+        if choice.isdigit() and 1 <= int(choice) <= len(trackers):
+            removed = trackers.pop(int(choice) - 1)
+            save_trackers(trackers)
+            print(f"Deleted tracker: {removed['name']}")
+
+
+def select_trackers():
+    while True:
+        trackers = load_trackers()
+        print("\nTrackers:")
+        for i, t in enumerate(trackers[:7], 1):
+            print(f"{i} - {t['name']}")
+        print("8 - All")
+        print("9 - Add")
+        print("0 - Manage")
+        choice = input("Choose an option: ").strip()
+        if choice == "0":
+            manage_trackers()
+        elif choice == "9":
+            add_tracker()
+        elif choice == "8":
+            return trackers
+        elif choice.isdigit() and 1 <= int(choice) <= len(trackers[:7]):
+            return [trackers[int(choice) - 1]]
+        else:
+            print("Invalid option.")
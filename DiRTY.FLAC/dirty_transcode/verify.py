@@ -0,0 +1,191 @@
+"""Output verification before torrents are made or sources are deleted."""
+import hashlib
+import subprocess
+from pathlib import Path
+from collections import namedtuple
+
+from . import config
+from .cache import get_cache
+from .deviceio import get_device_io
+from .events import stage_timer
+from .flac16 import flac16_sample_rate
+from .journal import get_journal
+from .manifest import output_file
+from .tags import MP3_FRAMES
+
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+Mp3Stream = namedtuple('Mp3Stream', 'sample_rate samples_per_frame frames header_frames delay padding truncated junk')
+
+
+def mp3_frame_header(data, pos):
+    """(frame length, sample rate, samples per frame, side info size) of a Layer III header, or None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 3
+    bitrate_index = b2 >> 4
+    if version == 1 or (b1 >> 1) & 3 != 1 or bitrate_index in (0, 15) or (b2 >> 2) & 3 == 3:
+        return None
+    mpeg1 = version == 3
+    sample_rate = MP3_SAMPLE_RATES[version][(b2 >> 2) & 3]
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + ((b2 >> 1) & 1)
+    mono = b3 >> 6 == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return length, sample_rate, 1152 if mpeg1 else 576, side_info
+
+
+def scan_mp3(path):
+    """Walk every MPEG frame header of an MP3 without decoding audio.
+
+    Reads the Xing/Info frame count and the LAME encoder delay/padding, so
+    the gapless sample count can be checked against the source.
+    """
+    data = Path(path).read_bytes()
+    pos = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        pos = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]) + (10 if data[5] & 0x10 else 0)
+    end = len(data)
+    if end - 128 >= pos and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    data = data[:end]
+
+    sample_rate = frames = junk = 0
+    samples_per_frame = 1152
+    header_frames = delay = padding = None
+    truncated = False
+    first = True
+    while pos < end:
+        header = mp3_frame_header(data, pos)
+        if header is None:
+            resync = data.find(b'\xff', pos + 1)
+            resync = end if resync < 0 else resync
+            junk += resync - pos
+            pos = resync
+            continue
+        length, sample_rate, samples_per_frame, side_info = header
+        if pos + length > end:
+            truncated = True
+            break
+        tag = data[pos + 4 + side_info:pos + 8 + side_info]
+        if first and tag in (b'Xing', b'Info'):
+            xing = pos + 8 + side_info
+            flags = int.from_bytes(data[xing:xing + 4], 'big')
+            xing += 4
+            if flags & 1:
+                header_frames = int.from_bytes(data[xing:xing + 4], 'big')
+            xing += 4 * bool(flags & 1) + 4 * bool(flags & 2) + 100 * bool(flags & 4) + 4 * bool(flags & 8)
+            if data[xing:xing + 4] in (b'LAME', b'Lavc', b'Lavf', b'L3.9') and xing + 24 <= end:
+                d = data[xing + 21:xing + 24]
+                delay, padding = (d[0] << 4) | (d[1] >> 4), ((d[1] & 0x0F) << 8) | d[2]
+        else:
+            frames += 1
+        first = False
+        pos += length
+    return Mp3Stream(sample_rate, samples_per_frame, frames, header_frames, delay, padding, truncated, junk)
+
+
+def verify_mp3(track, out_file, cover):
+    from mutagen.id3 import ID3
+    problems = []
+    stream = scan_mp3(out_file)
+    per_frame = stream.samples_per_frame
+    if not stream.frames:
+        return ["no MPEG audio frames"]
+    if stream.truncated:
+        problems.append("last frame is cut off")
+    if stream.header_frames is not None and stream.frames != stream.header_frames:
+        problems.append(f"{stream.frames} frames, Xing header says {stream.header_frames}")
+    if track.sample_rate and track.total_samples:
+        expected = track.total_samples * stream.sample_rate / track.sample_rate
+        decoded = stream.frames * per_frame
+        if stream.delay is not None:
+            decoded -= stream.delay + stream.padding
+            # Gapless length is exact unless LAME resampled
+            slack = 0 if stream.sample_rate == track.sample_rate else per_frame
+            low, high = expected - slack - 1, expected + slack + 1
+        else:
+            low, high = expected, expected + 3 * per_frame
+        if not low <= decoded <= high:
+            problems.append(f"{decoded / stream.sample_rate:.3f}s of audio, source is {track.length:.3f}s "
+                            f"({decoded} vs {expected:.0f} samples)")
+    id3 = ID3(out_file)
+    present = {frame.FrameID for frame in id3.values()}
+    # mutagen reads the v2.3 TYER frame back as TDRC
+    expected = {'TDRC' if MP3_FRAMES[k] == 'TYER' else MP3_FRAMES[k] for k in track.tags if k in MP3_FRAMES}
+    missing = sorted(expected - present)
+    if missing:
+        problems.append(f"missing tags: {', '.join(missing)}")
+    if cover and not any(hashlib.sha1(apic.data).hexdigest() == cover.digest for apic in id3.getall('APIC')):
+        problems.append("cover art not embedded")
+    return problems
+
+
+def verify_flac(track, out_file, cover):
+    from mutagen.flac import FLAC
+    problems = []
+    result = subprocess.run([config.FLAC_CMD, '--test', '--silent', str(out_file)], capture_output=True)
+    if result.returncode != 0:
+        problems.append(f"flac --test failed: {result.stderr.decode(errors='replace').strip()}")
+    audio = FLAC(out_file)
+    rate = flac16_sample_rate(track.sample_rate)
+    expected = -(-track.total_samples * rate // track.sample_rate) if track.sample_rate else 0
+    if (audio.info.bits_per_sample, audio.info.sample_rate) != (16, rate):
+        problems.append(f"{audio.info.bits_per_sample} bit / {audio.info.sample_rate} Hz, expected 16 bit / {rate} Hz")
+    if track.total_samples and audio.info.total_samples != expected:
+        problems.append(f"{audio.info.total_samples} samples, expected {expected}")
+    present = {k.lower() for k in (audio.tags.keys() if audio.tags else [])}
+    missing = sorted(k for k in track.vorbis if k.lower() not in present)
+    if missing:
+        problems.append(f"missing tags: {', '.join(missing)}")
+    if cover and not any(hashlib.sha1(p.data).hexdigest() == cover.digest for p in audio.pictures):
+        problems.append("cover art not embedded")
+    return problems
+
+
+def verify_output(track, preset, out_file, cover):
+    """Check one encoded file against its source; returns True if it is complete and tagged."""
+    with stage_timer('verify', album=track.path.parent.name, item=out_file.name, preset=preset) as ev:
+        try:
+            with get_device_io().reading(out_file):
+                if not out_file.exists() or out_file.stat().st_size == 0:
+                    problems = ["missing or empty"]
+                elif preset in config.FLAC_PRESETS:
+                    problems = verify_flac(track, out_file, cover)
+                else:
+                    problems = verify_mp3(track, out_file, cover)
+        except Exception as e:
+            problems = [f"could not be read: {e}"]
+        ev['ok'] = not problems
+        ev['bytes_in'] = out_file.stat().st_size if out_file.exists() else 0
+        if problems:
+            ev['problems'] = problems
+    if problems:
+        print(f"Verification failed for {out_file}: {'; '.join(problems)}")
+        journal = get_journal()
+        if journal:
+            # Re-encode next run instead of trusting the journal's 'done'
+            journal.mark(track.md5, preset, out_file, 'failed')
+        cache = get_cache()
+        if cache and cache.discard(track.md5, preset):
+            # The cached encode is what went into this file, so don't restore it again
+            print(f"Dropped the cached {preset} encode of {track.rel_path}")
+    return not problems
+
+
+def verify_album(manifest, targets, results, scheduler):
+    """Verify every output of the presets that encoded; returns preset -> all outputs verified."""
+    checks = {preset: [scheduler.verify(verify_output, track, preset, output_file(targets[preset], track, preset),
+                                        manifest.art)
+                       for track in manifest.tracks]
+              for preset in targets if results[preset]}
+    verified = {preset: results[preset] and all(f.result() for f in checks.get(preset, ())) for preset in targets}
+    for preset, ok in verified.items():
+        if results[preset] and ok:
+            print(f"Verified {len(manifest.tracks)} {config.PRESET_FOLDERS[preset]} files for {manifest.folder.name}")
+    return verified
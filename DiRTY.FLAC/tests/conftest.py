@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo: 417-byte frames of 1152 samples
+MP3_HEADER = b'\xff\xfb\x90\x64'
+MP3_FRAME_LENGTH = 417
+
+
+@pytest.fixture
+def mp3_stream(tmp_path):
+    """Return write(frames, prefix=b'', suffix=b'') -> path of an MP3 made of silent frames."""
+    def write(frames, prefix=b'', suffix=b'', name='track.mp3'):
+        path = tmp_path / name
+        frame = MP3_HEADER + bytes(MP3_FRAME_LENGTH - len(MP3_HEADER))
+        path.write_bytes(prefix + frame * frames + suffix)
+        return path
+    return write
@@ -0,0 +1,28 @@
+import sys
+
+import pytest
+
+from dirty_transcode import AlbumJob, Transcoder, config
+
+
+@pytest.fixture
+def no_lame(monkeypatch):
+    monkeypatch.setattr(config, 'FLAC_CMD', sys.executable)
+    monkeypatch.setattr(config, 'LAME_CMD', 'no-such-lame')
+
+
+def test_close_restores_overridden_settings(no_lame, tmp_path):
+    before = (config.OUTPUT_DIR, config.TORRENT_DIR, config.JOURNAL_FILE, config.TRANSCODE_CACHE_DIR)
+    with Transcoder(jobs=1, output_dir=tmp_path / 'out', torrent_dir=tmp_path / 'torrents', journal=False,
+                    cache=False):
+        assert config.OUTPUT_DIR == tmp_path / 'out'
+        assert config.TORRENT_DIR == tmp_path / 'torrents'
+        assert config.JOURNAL_FILE is None
+        assert config.TRANSCODE_CACHE_DIR is None
+    assert (config.OUTPUT_DIR, config.TORRENT_DIR, config.JOURNAL_FILE, config.TRANSCODE_CACHE_DIR) == before
+
+
+def test_lame_is_only_needed_for_mp3_presets(no_lame, tmp_path):
+    with Transcoder(jobs=1, output_dir=tmp_path, journal=False, cache=False) as transcoder:
+        with pytest.raises(RuntimeError, match='no-such-lame'):
+            transcoder.submit(AlbumJob(tmp_path / 'Album [FLAC]', ['FLAC16', 'V0']))
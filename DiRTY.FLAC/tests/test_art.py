@@ -0,0 +1,54 @@
+import hashlib
+import io
+
+import numpy as np
+import pytest
+
+from dirty_transcode import art, config
+
+
+def album_art(data, mime='image/png'):
+    return art.AlbumArt(data, mime, hashlib.sha1(data).hexdigest(), 'cover.png')
+
+
+def png(width, height, mode='RGBA'):
+    Image = pytest.importorskip('PIL.Image')
+    rng = np.random.default_rng(3)
+    pixels = rng.integers(0, 256, (height, width, len(mode)), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(art, '_NORMALIZED_ART', {})
+
+
+def test_oversized_cover_is_downscaled_to_a_jpeg_once():
+    Image = pytest.importorskip('PIL.Image')
+    cover = album_art(png(2400, 1800))
+    normalized = art.normalize_album_art(cover)
+
+    assert normalized.mime == 'image/jpeg'
+    assert len(normalized.data) <= config.ART_MAX_BYTES
+    assert normalized.digest == hashlib.sha1(normalized.data).hexdigest()
+    with Image.open(io.BytesIO(normalized.data)) as img:
+        assert (img.format, img.mode, img.size) == ('JPEG', 'RGB', (1000, 750))
+    # Every track and preset of the album gets the same bytes without redoing the work
+    assert art.normalize_album_art(cover) is normalized
+
+
+def test_small_cover_is_embedded_as_is():
+    cover = album_art(png(300, 300, 'RGB'))
+    assert art.normalize_album_art(cover) is cover
+
+
+def test_cover_is_kept_without_pillow_or_when_disabled(monkeypatch):
+    cover = album_art(bytes(config.ART_MAX_BYTES + 1), 'image/jpeg')
+    monkeypatch.setattr(art, 'Image', None)
+    assert art.normalize_album_art(cover) is cover
+
+    monkeypatch.setattr(config, 'ART_NORMALIZE', False)
+    assert art.normalize_album_art(cover) is cover
+    assert art.normalize_album_art(None) is None
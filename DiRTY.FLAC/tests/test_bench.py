@@ -0,0 +1,19 @@
+import pytest
+
+from dirty_transcode import bench, config
+
+SETTINGS = ('OUTPUT_DIR', 'TORRENT_DIR', 'JOURNAL_FILE', 'TRANSCODE_CACHE_DIR')
+
+
+def test_benchmark_restores_the_settings_it_overrides(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'BENCH_DIR', tmp_path / 'bench')
+    monkeypatch.setattr(bench, 'generate_bench_corpus', lambda root: [])
+    before = {name: getattr(config, name) for name in SETTINGS}
+
+    def interrupted(jobs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(bench, 'PipelineScheduler', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        bench.run_benchmark(jobs=1, presets=['V0'])
+    assert {name: getattr(config, name) for name in SETTINGS} == before
@@ -0,0 +1,102 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from mutagen.id3 import ID3
+
+from dirty_transcode import cache, config, encode, journal, manifest, verify
+
+MD5S = ['11' * 16, '22' * 16, '33' * 16]
+
+
+@pytest.fixture
+def lru(tmp_path):
+    lru = cache.TranscodeCache(tmp_path / 'cache', max_bytes=250)
+    yield lru
+    lru.close()
+
+
+def fake_output(tmp_path, md5, size=100):
+    out_file = tmp_path / f'{md5[:2]}.mp3'
+    out_file.write_bytes(md5[:2].encode() * (size // 2))
+    return out_file
+
+
+def test_least_recently_used_entry_is_evicted(lru, tmp_path):
+    first, second, third = MD5S
+    lru.store(first, 'V0', fake_output(tmp_path, first))
+    time.sleep(0.01)
+    lru.store(second, 'V0', fake_output(tmp_path, second))
+    time.sleep(0.01)
+    # A restore counts as a use, so `second` is now the oldest
+    assert lru.restore(first, 'V0', tmp_path / 'restored.mp3')
+    time.sleep(0.01)
+    lru.store(third, 'V0', fake_output(tmp_path, third))
+
+    assert lru.usage() == (2, 200)
+    assert lru.stats['evicted'] == 1
+    assert not lru.restore(second, 'V0', tmp_path / 'gone.mp3')
+    assert lru.restore(first, 'V0', tmp_path / 'first.mp3')
+    assert lru.restore(third, 'V0', tmp_path / 'third.mp3')
+    assert (tmp_path / 'third.mp3').read_bytes() == b'33' * 50
+
+
+def test_entries_are_per_preset_and_oversized_outputs_are_skipped(lru, tmp_path):
+    first = MD5S[0]
+    lru.store(first, 'V0', fake_output(tmp_path, first))
+    assert not lru.restore(first, '320', tmp_path / 'other.mp3')
+
+    lru.store(first, '320', fake_output(tmp_path, first, size=300))
+    assert lru.usage() == (1, 100)
+
+
+def test_lowered_cap_evicts_on_open(lru, tmp_path):
+    for md5 in MD5S[:2]:
+        lru.store(md5, 'V0', fake_output(tmp_path, md5))
+        time.sleep(0.01)
+    lru.close()
+
+    reopened = cache.TranscodeCache(lru.root, max_bytes=150)
+    try:
+        assert reopened.usage() == (1, 100)
+        assert reopened.restore(MD5S[1], 'V0', tmp_path / 'newest.mp3')
+    finally:
+        reopened.close()
+
+
+def test_failed_verification_drops_the_entry(lru, tmp_path, mp3_stream, monkeypatch):
+    monkeypatch.setattr(config, 'JOURNAL_FILE', None)
+    monkeypatch.setattr(config, 'TRANSCODE_CACHE_DIR', lru.root)
+    monkeypatch.setattr(cache, '_CACHE', lru)
+    md5 = MD5S[0]
+    # Truncated encoder output that still made it into the cache
+    out_file = mp3_stream(0, suffix=b'\xff\xfb\x90\x64' + bytes(100))
+    lru.store(md5, 'V0', out_file)
+    track = manifest.TrackInfo(path=tmp_path / 'track.flac', rel_path=Path('track.flac'), size=0, md5=md5)
+
+    assert not verify.verify_output(track, 'V0', out_file, None)
+    assert lru.usage() == (0, 0)
+    assert not lru.restore(md5, 'V0', tmp_path / 'again.mp3')
+
+
+def test_hit_with_stored_loudness_needs_no_decode(tmp_path, mp3_stream, monkeypatch):
+    store = cache.TranscodeCache(tmp_path / 'cache', max_bytes=1 << 20)
+    history = journal.TranscodeJournal(tmp_path / 'journal.sqlite3')
+    monkeypatch.setattr(config, 'JOURNAL_FILE', tmp_path / 'journal.sqlite3')
+    monkeypatch.setattr(journal, '_JOURNAL', history)
+    monkeypatch.setattr(config, 'TRANSCODE_CACHE_DIR', store.root)
+    monkeypatch.setattr(cache, '_CACHE', store)
+    monkeypatch.setattr(encode, 'encode_outputs', lambda *args: pytest.fail("decoded a track the cache had"))
+    md5 = MD5S[0]
+    store.store(md5, 'V0', mp3_stream(20))
+    history.store_loudness(md5, manifest.Loudness(np.full(100, 10 ** ((-23 + 0.691) / 10)), 0.5))
+    # Same audio under a renamed folder
+    track = manifest.TrackInfo(path=tmp_path / 'Renamed' / '01.flac', rel_path=Path('01.flac'), size=0, md5=md5,
+                               tags={'TITLE': 'One'})
+
+    assert encode.transcode_track(track, {'V0': tmp_path / 'out'}, None, measure=True) == {'V0': True}
+    id3 = ID3(tmp_path / 'out' / '01.mp3')
+    assert str(id3['TXXX:REPLAYGAIN_TRACK_GAIN']) == '+5.00 dB'
+    history.close()
+    store.close()
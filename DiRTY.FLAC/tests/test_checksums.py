@@ -0,0 +1,61 @@
+import hashlib
+import struct
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+
+from dirty_transcode import checksums, config, manifest
+
+SOURCE_MD5 = '0123456789abcdef' * 2
+OUTPUT_MD5 = 'fedcba9876543210' * 2
+
+
+def flac_header(md5, sample_rate=44100, channels=2, bits=16, samples=44100):
+    """'fLaC' and a lone STREAMINFO block: enough for mutagen to read the audio MD5."""
+    packed = sample_rate << 44 | (channels - 1) << 41 | (bits - 1) << 36 | samples
+    info = struct.pack('>HH', 4096, 4096) + bytes(6) + packed.to_bytes(8, 'big') + bytes.fromhex(md5)
+    return b'fLaC' + bytes([0x80]) + len(info).to_bytes(3, 'big') + info
+
+
+def test_file_checksums_match_hashlib_and_zlib(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'CHECKSUM_CHUNK', 1000)
+    data = bytes(range(256)) * 50
+    path = tmp_path / 'track.mp3'
+    path.write_bytes(data)
+    assert checksums.file_checksums(path) == (hashlib.md5(data).hexdigest(), zlib.crc32(data))
+
+    path.write_bytes(b'')
+    assert checksums.file_checksums(path) == (hashlib.md5(b'').hexdigest(), 0)
+
+
+def test_manifests_for_each_output_and_the_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'OUTPUT_DIR', tmp_path)
+    album = tmp_path / 'flac' / 'Artist - Album [FLAC]'
+    tracks = [manifest.TrackInfo(path=album / rel, rel_path=Path(rel), size=0, md5=SOURCE_MD5.upper())
+              for rel in ('CD1/01 - One.flac', 'CD2/01 - Two.flac')]
+    album_manifest = manifest.AlbumManifest(folder=album, tracks=tracks)
+    targets = {'V0': tmp_path / 'Artist - Album [MP3 V0]', 'FLAC16': tmp_path / 'Artist - Album [FLAC 16]'}
+    for preset, folder in targets.items():
+        for track in tracks:
+            out_file = manifest.output_file(folder, track, preset)
+            out_file.parent.mkdir(parents=True, exist_ok=True)
+            out_file.write_bytes(flac_header(OUTPUT_MD5) if preset == 'FLAC16' else track.rel_path.name.encode())
+    # A hash queued while the album encoded is used as is
+    queued = Future()
+    queued.set_result(('ab' * 16, 0xDEADBEEF))
+    album_manifest.checksums['V0'] = {tracks[0].rel_path: queued}
+
+    checksums.write_checksum_manifests(album_manifest, targets, ['V0', 'FLAC16'])
+
+    v0 = targets['V0']
+    second = hashlib.md5(b'01 - Two.flac').hexdigest()
+    assert (v0 / f'{v0.name}.md5').read_text() == f"{'ab' * 16}  CD1/01 - One.mp3\n{second}  CD2/01 - Two.mp3\n"
+    assert (v0 / f'{v0.name}.sfv').read_text() == \
+        f"CD1/01 - One.mp3 DEADBEEF\nCD2/01 - Two.mp3 {zlib.crc32(b'01 - Two.flac'):08X}\n"
+    assert not (v0 / f'{v0.name}.ffp').exists()
+
+    flac16 = targets['FLAC16']
+    assert (flac16 / f'{flac16.name}.ffp').read_text() == \
+        f"CD1/01 - One.flac:{OUTPUT_MD5}\nCD2/01 - Two.flac:{OUTPUT_MD5}\n"
+    assert (tmp_path / 'Artist - Album [FLAC].ffp').read_text() == \
+        f"CD1/01 - One.flac:{SOURCE_MD5}\nCD2/01 - Two.flac:{SOURCE_MD5}\n"
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from dirty_transcode import daemon
+
+ALBUM = Path('flac/Artist - Album [FLAC]')
+COPYING, COPIED = (3, 3000, 100.0), (10, 9000, 160.0)
+
+
+def test_album_is_queued_once_after_it_settles():
+    settler = daemon.AlbumSettler(settle=10)
+    assert settler.scan({ALBUM: COPYING}, now=0) == []
+    # Still being copied: the settle time starts over
+    assert settler.scan({ALBUM: COPIED}, now=8) == []
+    assert settler.scan({ALBUM: COPIED}, now=15) == []
+    assert settler.timeout(now=15, poll_interval=60) == 3
+    assert settler.scan({ALBUM: COPIED}, now=18) == [ALBUM]
+    assert settler.scan({ALBUM: COPIED}, now=100) == []
+    assert settler.timeout(now=100, poll_interval=60) == 60
+
+
+def test_empty_folder_is_never_queued():
+    settler = daemon.AlbumSettler(settle=10)
+    settler.scan({ALBUM: (0, 0, 0.0)}, now=0)
+    assert settler.scan({ALBUM: (0, 0, 0.0)}, now=60) == []
+
+
+def test_deleted_and_recreated_album_is_queued_again():
+    settler = daemon.AlbumSettler(settle=10)
+    settler.scan({ALBUM: COPIED}, now=0)
+    assert settler.scan({ALBUM: COPIED}, now=10) == [ALBUM]
+    # Processed and deleted, then copied in again with the same files and mtimes
+    assert settler.scan({}, now=20) == []
+    assert not settler.handled and not settler.pending
+    settler.scan({ALBUM: COPIED}, now=30)
+    assert settler.scan({ALBUM: COPIED}, now=40) == [ALBUM]
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is Linux only")
+def test_recreated_folder_is_watched_again(tmp_path):
+    watcher = daemon.InotifyWatcher()
+    try:
+        album = tmp_path / 'Album [FLAC]'
+        album.mkdir()
+        watcher.watch(album)
+        album.rmdir()
+        watcher.retain([tmp_path])
+        assert str(album) not in watcher._watched
+
+        album.mkdir()
+        watcher.watch(album)
+        (album / '01.flac').write_bytes(b'fLaC')
+        assert watcher.wait(2)
+    finally:
+        watcher.close()
@@ -0,0 +1,28 @@
+import os
+
+from dirty_transcode import deviceio
+
+
+def test_device_without_sysfs_entry_is_unknown():
+    # Major 0 is the anonymous device range btrfs and network filesystems use
+    assert deviceio.block_device(os.makedev(0, 4095)) == ('0:4095', None)
+
+
+def test_unknown_device_gets_the_hdd_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(deviceio, 'block_device', lambda dev: ('0:42', None))
+    capped = deviceio.DeviceIO(hdd_readers=2, ssd_readers=None)
+    assert capped.device(tmp_path) == ('0:42', True)
+    assert capped._gate(tmp_path) is not None
+
+    uncapped = deviceio.DeviceIO(hdd_readers=2, ssd_readers=None, unknown_rotational=False)
+    assert uncapped._gate(tmp_path) is None
+
+
+def test_hints_are_skipped_without_fadvise(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, 'posix_fadvise', raising=False)
+    monkeypatch.setattr(deviceio, 'block_device', lambda dev: ('sda', True))
+    source = tmp_path / 'track.flac'
+    source.write_bytes(bytes(1000))
+    device_io = deviceio.DeviceIO()
+    device_io.prefetch(source)
+    device_io.read_in(source)
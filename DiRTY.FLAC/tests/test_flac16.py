@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from dirty_transcode import album, flac16
+
+
+def resample(x, up, down, chunk=10000):
+    resampler = flac16.PolyphaseResampler(up, down, x.shape[1])
+    parts = [resampler.process(x[i:i + chunk]) for i in range(0, len(x), chunk)]
+    return np.concatenate(parts + [resampler.flush()])
+
+
+def sine(rate, freq, seconds, amplitude=0.5, channels=2):
+    t = np.arange(int(rate * seconds)) / rate
+    return np.stack([amplitude * np.sin(2 * np.pi * freq * t)] * channels, axis=1)
+
+
+@pytest.mark.parametrize('rate_in, up, down', [
+    (96000, 1, 2),
+    (192000, 1, 4),
+    (48000, 147, 160),
+])
+@pytest.mark.parametrize('frames', [1, 4097, 96001])
+def test_output_length_is_exact(rate_in, up, down, frames):
+    x = np.zeros((frames, 2))
+    assert len(resample(x, up, down)) == -(-frames * up // down)
+
+
+@pytest.mark.parametrize('rate_in, up, down', [
+    (96000, 1, 2),
+    (176400, 1, 4),
+    (48000, 147, 160),
+])
+def test_passband_tone_keeps_its_amplitude_and_phase(rate_in, up, down):
+    rate_out = rate_in * up // down
+    y = resample(sine(rate_in, 1000, 1.0), up, down)
+    expected = sine(rate_out, 1000, 1.0)[:len(y)]
+    # The filter's group delay is compensated, so the output lines up with the ideal tone
+    middle = slice(len(y) // 4, 3 * len(y) // 4)
+    assert np.abs(y[middle] - expected[middle]).max() < 1e-4
+
+
+def test_tone_above_new_nyquist_is_removed():
+    y = resample(sine(96000, 30000, 1.0), 1, 2)
+    middle = y[len(y) // 4:3 * len(y) // 4]
+    assert np.sqrt((middle ** 2).mean()) < 0.5 * 10 ** (-80 / 20)
+
+
+def test_sample_rate_drops_to_the_family_rate():
+    assert flac16.flac16_sample_rate(44100) == 44100
+    assert flac16.flac16_sample_rate(48000) == 48000
+    assert flac16.flac16_sample_rate(88200) == 44100
+    assert flac16.flac16_sample_rate(192000) == 48000
+
+
+def test_output_folder_name():
+    name = album.output_folder_name
+    assert name('Artist - Album (2020) [FLAC]', 'V0') == 'Artist - Album (2020) [MP3 V0]'
+    assert name('Artist - Album flac', '320') == 'Artist - Album MP3 320'
+    # Hi-res markers only go away for the 16-bit FLAC copy
+    assert name('Artist - Album (2020) [FLAC 24-96]', 'V2') == 'Artist - Album (2020) [MP3 V2 24-96]'
+    assert name('Artist - Album (2020) [FLAC 24-96]', 'FLAC16') == 'Artist - Album (2020) [FLAC 16]'
+    assert name('Artist - Album (2020) [24bit FLAC]', 'FLAC16') == 'Artist - Album (2020) [FLAC 16]'
+    assert name('Artist - Album (2020) [FLAC] (24-192)', 'FLAC16') == 'Artist - Album (2020) [FLAC 16]'
+    # Whole tokens go, along with the separators they leave behind
+    assert name('Artist - Album [24bit-96kHz FLAC]', 'FLAC16') == 'Artist - Album [FLAC 16]'
+    assert name('Artist - Album [FLAC] 24bit', 'FLAC16') == 'Artist - Album [FLAC 16]'
+    assert name('Artist - Album [FLAC, 24bit, WEB]', 'FLAC16') == 'Artist - Album [FLAC 16, WEB]'
+    assert name('Artist - Album - 24-bit - FLAC', 'FLAC16') == 'Artist - Album - FLAC 16'
+    assert name('Artist - Album 2496 [FLAC]', 'FLAC16') == 'Artist - Album 2496 [FLAC 16]'
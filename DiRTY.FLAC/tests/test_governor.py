@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from dirty_transcode import governor, pipeline
+
+
+def test_parse_cpu_list():
+    assert governor.parse_cpu_list('0-3,6') == {0, 1, 2, 3, 6}
+    assert governor.parse_cpu_list('5') == {5}
+    assert governor.parse_cpu_list('2-2,1') == {1, 2}
+    with pytest.raises(ValueError):
+        governor.parse_cpu_list('a-b')
+
+
+def test_parse_ionice():
+    assert governor.parse_ionice('best-effort:7') == ('best-effort', 7)
+    assert governor.parse_ionice('best-effort') == ('best-effort', 4)
+    assert governor.parse_ionice('idle') == ('idle', 4)
+    with pytest.raises(ValueError):
+        governor.parse_ionice('background')
+
+
+def acquire_in_thread(budget):
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (budget.acquire(), acquired.set()), daemon=True)
+    thread.start()
+    return acquired
+
+
+def test_resize_shrinks_and_grows_the_budget():
+    budget = pipeline.CpuBudget(2)
+    assert budget.acquire(2) == 2
+
+    # Holders over the smaller budget keep their slots; new acquires wait for room
+    budget.resize(1)
+    budget.release()
+    waiting = acquire_in_thread(budget)
+    assert not waiting.wait(0.2)
+
+    budget.resize(3)
+    assert waiting.wait(2)
+    assert budget.used == 2
+
+
+def test_resize_keeps_at_least_one_slot_and_caps_requests():
+    budget = pipeline.CpuBudget(4)
+    budget.resize(0)
+    assert budget.slots == 1
+    with budget.hold(4) as n:
+        assert n == 1
+    assert budget.used == 0
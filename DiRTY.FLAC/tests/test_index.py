@@ -0,0 +1,48 @@
+from dirty_transcode import files, index, manifest
+
+
+def test_only_jpg_and_png_images_are_copied(tmp_path):
+    album = tmp_path / 'Artist - Album [FLAC]'
+    (album / 'Scans').mkdir(parents=True)
+    for name in ('cover.jpg', 'Scans/back.PNG', 'Scans/inlay.jpeg', 'Scans/disc.bmp'):
+        (album / name).write_bytes(b'image')
+    dest = tmp_path / 'out'
+
+    files.copy_images(album, dest)
+    assert sorted(p.relative_to(dest).as_posix() for p in dest.rglob('*') if p.is_file()) == \
+        ['Scans/back.PNG', 'cover.jpg']
+
+
+def make_album(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(name.encode())
+    return root
+
+
+def test_multi_disc_album_is_indexed_in_disc_order(tmp_path):
+    album = make_album(tmp_path / 'Artist - Album [FLAC]', [
+        'CD10/01 - Ten.flac', 'CD2/10 - Two Ten.flac', 'CD2/2 - Two Two.flac', 'CD1/01 - One.FLAC',
+        'CD1/folder.jpg', 'cover.jpg', 'rip.log', 'CD1/album.cue', 'notes.txt'])
+    album_index = index.index_album(album)
+
+    assert [f.rel_path.as_posix() for f in album_index.flac] == [
+        'CD1/01 - One.FLAC', 'CD2/2 - Two Two.flac', 'CD2/10 - Two Ten.flac', 'CD10/01 - Ten.flac']
+    assert [f.rel_path.as_posix() for f in album_index.images] == ['CD1/folder.jpg', 'cover.jpg']
+    assert [f.rel_path.name for f in album_index.logs + album_index.cues + album_index.other] == ['rip.log', 'album.cue', 'notes.txt']
+    assert sorted(d.name for d in album_index.dirs) == ['CD1', 'CD10', 'CD2']
+    assert album_index.signature()[:2] == (9, sum(f.size for f in album_index.files))
+
+
+def test_disc_folders_number_tracks_and_shape_the_outputs(tmp_path):
+    album = make_album(tmp_path / 'Artist - Album [FLAC]', [
+        'CD1/01 - One.flac', 'Disc 2/01 - Two.flac', 'CD1/folder.jpg', 'cover.jpg'])
+    album_manifest = manifest.build_album_manifest(album)
+
+    assert [t.tags.get('DISCNUMBER') for t in album_manifest.tracks] == ['1', '2']
+    out = tmp_path / 'out'
+    assert [manifest.output_file(out, t, 'V0') for t in album_manifest.tracks] == [
+        out / 'CD1' / '01 - One.mp3', out / 'Disc 2' / '01 - Two.mp3']
+    # The album folder's own image wins over a disc folder's
+    assert album_manifest.art.source == album / 'cover.jpg'
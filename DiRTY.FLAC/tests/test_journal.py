@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from dirty_transcode import config, encode, journal, manifest
+
+MD5 = 'ab' * 16
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    history = journal.TranscodeJournal(tmp_path / 'journal.sqlite3')
+    monkeypatch.setattr(config, 'JOURNAL_FILE', tmp_path / 'journal.sqlite3')
+    monkeypatch.setattr(journal, '_JOURNAL', history)
+    monkeypatch.setattr(config, 'TRANSCODE_CACHE_DIR', None)
+    yield history
+    history.close()
+
+
+def test_only_complete_outputs_count_as_done(history, tmp_path):
+    out_file = tmp_path / '01.mp3'
+    out_file.write_bytes(bytes(500))
+    history.mark(MD5, 'V0', out_file, 'started')
+    assert not history.is_done(MD5, 'V0', out_file)
+
+    history.mark(MD5, 'V0', out_file, 'done', 500)
+    assert history.is_done(MD5, 'V0', out_file)
+    assert not history.is_done(MD5, '320', out_file)
+    assert not history.is_done(MD5, 'V0', tmp_path / 'elsewhere.mp3')
+
+    # Cut short or rewritten since
+    out_file.write_bytes(bytes(200))
+    assert not history.is_done(MD5, 'V0', out_file)
+
+    # A zeroed STREAMINFO MD5 identifies nothing
+    history.mark('0' * 32, 'V0', out_file, 'done', 200)
+    assert not history.is_done('0' * 32, 'V0', out_file)
+
+
+def test_rerun_skips_done_presets_and_redoes_half_written_ones(history, tmp_path, mp3_stream, monkeypatch):
+    source = tmp_path / 'flac' / '01.flac'
+    source.parent.mkdir()
+    source.write_bytes(b'fLaC')
+    track = manifest.TrackInfo(path=source, rel_path=Path('01.flac'), size=4, md5=MD5, tags={'TITLE': 'One'})
+    targets = {'V0': tmp_path / 'V0', '320': tmp_path / '320'}
+    frames = mp3_stream(20).read_bytes()
+    encoded = []
+
+    def encode_outputs(track, outputs, meter, analyzer):
+        for preset, out_file in outputs.items():
+            out_file.write_bytes(frames)
+            encoded.append(preset)
+        return None, dict.fromkeys(outputs)
+
+    monkeypatch.setattr(encode, 'encode_outputs', encode_outputs)
+    assert encode.transcode_track(track, targets, None) == {'V0': True, '320': True}
+    assert encoded == ['V0', '320']
+
+    # Interrupted mid-encode: the 320 is half-written and its row still says 'started'
+    out_320 = manifest.output_file(targets['320'], track, '320')
+    history.mark(MD5, '320', out_320, 'started')
+    out_320.write_bytes(frames[:1000])
+    encoded.clear()
+    assert encode.transcode_track(track, targets, None) == {'V0': True, '320': True}
+    assert encoded == ['320']
+    assert history.is_done(MD5, '320', out_320)
+
+    encoded.clear()
+    assert encode.transcode_track(track, targets, None) == {'V0': True, '320': True}
+    assert encoded == []
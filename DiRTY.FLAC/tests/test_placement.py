@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from dirty_transcode import config, files
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / 'cover.jpg'
+    src.write_bytes(os.urandom(300000))
+    src.chmod(0o640)
+    return src
+
+
+def test_hardlink_first(src, tmp_path):
+    dest = tmp_path / 'out.jpg'
+    assert files.place_file(src, dest) == 'hardlink'
+    assert os.path.samefile(src, dest)
+    # Placing it again is a no-op
+    assert files.place_file(src, dest) == 'hardlink'
+
+
+def test_no_hardlink_for_files_modified_in_place(src, tmp_path):
+    dest = tmp_path / 'out.jpg'
+    dest.write_bytes(b'stale')
+    method = files.place_file(src, dest, hardlink=False)
+    assert method in ('reflink', 'copy_file_range', 'copy')
+    assert not os.path.samefile(src, dest)
+    assert dest.read_bytes() == src.read_bytes()
+    assert dest.stat().st_mode == src.stat().st_mode
+
+
+def test_falls_back_when_links_and_clones_fail(src, tmp_path, monkeypatch):
+    def refuse(*args):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, 'link', refuse)
+    dest = tmp_path / 'clone.jpg'
+    assert files.place_file(src, dest) in ('reflink', 'copy_file_range', 'copy')
+    assert dest.read_bytes() == src.read_bytes()
+
+    # A clone that fails part-way leaves nothing behind for the plain copy to append to
+    def partial(fsrc, fdst, method):
+        fdst.write(b'partial')
+        raise OSError("not supported")
+
+    monkeypatch.setattr(files, '_clone_into', partial)
+    dest = tmp_path / 'copy.jpg'
+    assert files.place_file(src, dest) == 'copy'
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_placement_methods_can_be_skipped(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PLACEMENT_METHODS', ('copy',))
+    dest = tmp_path / 'out.jpg'
+    assert files.place_file(src, dest) == 'copy'
+    assert not os.path.samefile(src, dest)
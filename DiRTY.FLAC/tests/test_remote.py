@@ -0,0 +1,120 @@
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from dirty_transcode import config, encode, manifest, remote
+
+
+class FakeWorker:
+    """Speaks the worker side of the coordinator protocol over a plain socket."""
+
+    def __init__(self, address, name):
+        self.sock = socket.create_connection(address)
+        self.rfile, self.wfile = self.sock.makefile('rb'), self.sock.makefile('wb')
+        self.lock = threading.Lock()
+        self.send(op='hello', worker=name)
+
+    def send(self, **message):
+        remote.send_message(self.wfile, self.lock, **message)
+
+    def ask(self, **message):
+        self.send(**message)
+        return remote.read_message(self.rfile)
+
+    def close(self):
+        # The socket stays open until its file objects are closed too
+        self.rfile.close()
+        self.wfile.close()
+        self.sock.close()
+
+
+@pytest.fixture
+def coordinator(monkeypatch):
+    monkeypatch.setattr(config, 'REMOTE_LEASE_SECONDS', 1)
+    monkeypatch.setattr(config, 'REMOTE_POLL_SECONDS', 0.2)
+    server = remote.RemoteEncoder(('127.0.0.1', 0))
+    yield server
+    server.close()
+
+
+def submit(server):
+    track = manifest.TrackInfo(path=Path('flac/Album/01.flac'), rel_path=Path('01.flac'), size=0)
+    return server.submit(encode.transcode_track, track, {'V0': Path('mp3/Album')}, None)
+
+
+def test_expired_lease_is_reassigned_and_old_token_ignored(coordinator):
+    address = coordinator._server.server_address
+    future = submit(coordinator)
+    first, second = FakeWorker(address, 'first'), FakeWorker(address, 'second')
+    try:
+        job = first.ask(op='get')
+        assert job['op'] == 'job'
+        assert first.ask(op='renew', token=job['token']) == {'op': 'renewed', 'ok': True}
+
+        # No more renewals: the reaper takes the lease back and the job goes out again
+        retry = second.ask(op='get')
+        while retry['op'] == 'wait':
+            retry = second.ask(op='get')
+        assert retry['op'] == 'job'
+        assert retry['token'] != job['token']
+
+        assert first.ask(op='renew', token=job['token']) == {'op': 'renewed', 'ok': False}
+        first.send(op='done', token=job['token'], results={'V0': False})
+        assert second.ask(op='renew', token=retry['token']) == {'op': 'renewed', 'ok': True}
+        assert not future.done()
+
+        second.send(op='done', token=retry['token'], results={'V0': True})
+        assert future.result(timeout=5) == {'V0': True}
+    finally:
+        first.close()
+        second.close()
+
+
+def test_stale_disconnect_does_not_requeue_the_new_lease(coordinator):
+    address = coordinator._server.server_address
+    future = submit(coordinator)
+    first, second = FakeWorker(address, 'first'), FakeWorker(address, 'second')
+    try:
+        job = first.ask(op='get')
+        retry = second.ask(op='get')
+        while retry['op'] == 'wait':
+            retry = second.ask(op='get')
+
+        first.close()
+        deadline = time.monotonic() + 5
+        while coordinator._connections != 1:
+            assert time.monotonic() < deadline
+            assert second.ask(op='renew', token=retry['token'])['ok']
+            time.sleep(0.05)
+        assert list(coordinator._leased) == [retry['token']]
+        assert not coordinator._queue
+
+        second.send(op='done', token=retry['token'], results={'V0': True})
+        assert future.result(timeout=5) == {'V0': True}
+        assert job['token'] != retry['token']
+    finally:
+        second.close()
+
+
+def test_revoked_lease_kills_registered_processes():
+    lease = encode.WorkerLease()
+    proc = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    lease.register(proc)
+    lease.revoke()
+    assert proc.wait(timeout=5) != 0
+
+    late = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    lease.register(late)
+    assert late.wait(timeout=5) != 0
+
+
+def test_bare_port_listens_on_loopback_only():
+    assert remote.parse_address('7600') == ('127.0.0.1', 7600)
+    assert remote.parse_address(':7600') == ('127.0.0.1', 7600)
+    assert remote.parse_address('0.0.0.0:7600') == ('0.0.0.0', 7600)
+    assert remote.parse_address('coordinator-host:7600') == ('coordinator-host', 7600)
@@ -0,0 +1,60 @@
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dirty_transcode import config, replaygain
+
+RATE = 48000
+
+
+def wav(x):
+    """16-bit stereo WAV bytes, as `flac --decode` would write them."""
+    pcm = np.round(x * 32767).astype('<i2').tobytes()
+    fmt = struct.pack('<IHHIIHH', 16, 1, x.shape[1], RATE, RATE * 4, 4, 16)
+    return b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVEfmt ' + fmt + b'data' + struct.pack('<I', len(pcm)) + pcm
+
+
+def tones(*sections):
+    """1 kHz stereo sine, in (dBFS, seconds) sections."""
+    parts = []
+    for dbfs, seconds in sections:
+        t = np.arange(round(RATE * seconds)) / RATE
+        parts.append(10 ** (dbfs / 20) * np.sin(2 * np.pi * 1000 * t))
+    signal = np.concatenate(parts)
+    return np.stack([signal, signal], axis=1)
+
+
+def measure(x):
+    meter = replaygain.LoudnessMeter(SimpleNamespace(channels=2, bits_per_sample=16, sample_rate=RATE))
+    data = wav(x)
+    for i in range(0, len(data), config.PCM_CHUNK_SIZE):
+        meter.write(data[i:i + config.PCM_CHUNK_SIZE])
+    meter.close()
+    return meter.result()
+
+
+# EBU Tech 3341 (2016), table 1: cases 1-5 all measure within +/-0.1 LU of their target
+@pytest.mark.parametrize('sections, target', [
+    ([(-23, 20)], -23.0),
+    ([(-33, 20)], -33.0),
+    ([(-36, 10), (-23, 60), (-36, 10)], -23.0),
+    ([(-72, 10), (-36, 10), (-23, 60), (-36, 10), (-72, 10)], -23.0),
+    ([(-26, 20), (-20, 20.1), (-26, 20)], -23.0),
+])
+def test_integrated_loudness_matches_ebu_3341(sections, target):
+    assert replaygain.gated_loudness(measure(tones(*sections)).blocks) == pytest.approx(target, abs=0.1)
+
+
+def test_silence_has_no_loudness():
+    assert replaygain.gated_loudness(measure(np.zeros((RATE * 2, 2))).blocks) is None
+
+
+def test_album_gain_pools_the_tracks_blocks():
+    quiet, loud = measure(tones((-45, 10))), measure(tones((-23, 10)))
+    album = replaygain.replaygain_tags('ALBUM', [quiet, loud])
+    # The pooled blocks gate at about -36 LUFS, which drops the quiet track
+    gain = float(album['REPLAYGAIN_ALBUM_GAIN'].split()[0])
+    assert gain == pytest.approx(config.REPLAYGAIN_REFERENCE + 23, abs=0.1)
+    assert float(album['REPLAYGAIN_ALBUM_PEAK']) == pytest.approx(10 ** (-23 / 20), abs=1e-3)
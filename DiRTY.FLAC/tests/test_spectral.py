@@ -0,0 +1,59 @@
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from dirty_transcode import config, spectral
+
+
+def noise(rate, seconds=5, lowpass=None):
+    """Stereo white noise, optionally cut off by an ideal brickwall lowpass."""
+    rng = np.random.default_rng(7)
+    x = rng.standard_normal(rate * seconds)
+    if lowpass:
+        spectrum = np.fft.rfft(x)
+        spectrum[np.fft.rfftfreq(len(x), 1 / rate) > lowpass] = 0
+        x = np.fft.irfft(spectrum, len(x))
+    x *= 0.2 / np.sqrt((x ** 2).mean())
+    return np.stack([x, x], axis=1)
+
+
+def analyze(x, rate):
+    track = SimpleNamespace(channels=2, bits_per_sample=16, sample_rate=rate, total_samples=len(x))
+    pcm = np.round(x * 32767).astype('<i2').tobytes()
+    fmt = struct.pack('<IHHIIHH', 16, 1, 2, rate, rate * 4, 4, 16)
+    data = b'RIFF' + struct.pack('<I', 36 + len(pcm)) + b'WAVEfmt ' + fmt + b'data' + struct.pack('<I', len(pcm)) + pcm
+    analyzer = spectral.SpectrumAnalyzer(track)
+    for i in range(0, len(data), config.PCM_CHUNK_SIZE):
+        analyzer.write(data[i:i + config.PCM_CHUNK_SIZE])
+    analyzer.close()
+    return analyzer.result()
+
+
+@pytest.mark.parametrize('rate', [44100, 96000])
+def test_full_bandwidth_track_is_not_flagged(rate):
+    assert spectral.spectral_verdict(analyze(noise(rate), rate)) is None
+
+
+def test_lossy_lowpass_is_flagged():
+    spectrum = analyze(noise(44100, lowpass=16000), 44100)
+    cutoff, steep = spectral.spectral_cutoff(spectrum)
+    assert steep and cutoff == pytest.approx(16000, abs=300)
+    verdict = spectral.spectral_verdict(spectrum)
+    assert verdict.startswith("lowpass at 16.") and verdict.endswith("possible lossy source")
+
+
+def test_upsampled_hires_track_is_flagged():
+    spectrum = analyze(noise(96000, lowpass=22050), 96000)
+    assert spectral.spectral_verdict(spectrum).endswith("possibly upsampled from 44.1/48 kHz")
+
+
+def test_gentle_rolloff_is_not_a_brickwall():
+    x = noise(44100)
+    spectrum = np.fft.rfft(x[:, 0])
+    freqs = np.fft.rfftfreq(len(x), 1 / 44100)
+    # About 6 dB per kHz from 12 kHz up, like an old analog master
+    spectrum *= 10 ** (-np.clip(freqs - 12000, 0, None) / 1000 * 6 / 20)
+    rolled = np.fft.irfft(spectrum, len(x))
+    assert not spectral.spectral_cutoff(analyze(np.stack([rolled, rolled], axis=1), 44100))[1]
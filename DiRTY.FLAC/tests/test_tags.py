@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from dirty_transcode import manifest, tags, verify
+
+VALUES = {
+    'BPM': '128',
+    'COMPILATION': '1',
+    'DATE': '2020',
+    'DISCNUMBER': '1/2',
+    'TRACKNUMBER': '3/12',
+    'ISRC': 'USRC17607839',
+}
+
+
+def test_every_mp3_frame_round_trips(mp3_stream):
+    out_file = mp3_stream(20)
+    values = {key: VALUES.get(key, f'{key.lower()} value') for key in tags.MP3_FRAMES}
+    track = manifest.TrackInfo(path=Path('track.flac'), rel_path=Path('track.flac'), size=0, tags=values,
+                               sample_rate=44100, total_samples=20 * 1152)
+
+    assert tags.write_mp3_tags(out_file, values)
+    assert verify.verify_mp3(track, out_file, None) == []
+
+
+def test_missing_frame_is_reported(mp3_stream):
+    out_file = mp3_stream(20)
+    track = manifest.TrackInfo(path=Path('track.flac'), rel_path=Path('track.flac'), size=0,
+                               tags={'TITLE': 'Title', 'CONDUCTOR': 'Someone'})
+
+    assert tags.write_mp3_tags(out_file, {'TITLE': 'Title'})
+    assert verify.verify_mp3(track, out_file, None) == ["missing tags: TPE3"]
@@ -0,0 +1,30 @@
+import pytest
+
+from dirty_transcode import config, torrents
+
+torf = pytest.importorskip('torf')
+
+TRACKERS = [{'name': 'RED', 'url': 'https://red.example/announce'},
+            {'name': 'OPS', 'url': 'https://ops.example/announce', 'source': 'OPS'}]
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'TORRENT_DIR', tmp_path / 'torrents')
+    (tmp_path / 'torrents').mkdir()
+    folder = tmp_path / 'Artist - Album [MP3 V0]'
+    folder.mkdir()
+    (folder / '01.mp3').write_bytes(bytes(100000))
+    return folder
+
+
+def test_combined_torrent_does_not_overwrite_a_per_tracker_one(folder):
+    assert torrents.torrent_job(folder, TRACKERS, threads=1, mode='per-tracker')
+    assert torrents.torrent_job(folder, TRACKERS, threads=1, mode='combined')
+
+    names = sorted(p.name for p in config.TORRENT_DIR.iterdir())
+    assert names == ['OPS_Artist_-_Album_[MP3_V0].torrent', 'RED+OPS_Artist_-_Album_[MP3_V0].torrent',
+                     'RED_Artist_-_Album_[MP3_V0].torrent']
+    combined = torf.Torrent.read(config.TORRENT_DIR / names[1])
+    assert combined.trackers == [[t['url'] for t in TRACKERS]]
+    assert torf.Torrent.read(config.TORRENT_DIR / names[2]).source == 'RED'
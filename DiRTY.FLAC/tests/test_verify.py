@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from conftest import MP3_FRAME_LENGTH, MP3_HEADER
+from dirty_transcode import manifest, tags, verify
+
+
+def info_frame(frames, delay, padding):
+    """Xing 'Info' frame with a frame count and a LAME tag carrying the encoder delay and padding."""
+    lame = b'LAME3.100' + bytes(12) + bytes([delay >> 4, (delay & 0x0F) << 4 | padding >> 8, padding & 0xFF])
+    body = MP3_HEADER + bytes(32) + b'Info' + (1).to_bytes(4, 'big') + frames.to_bytes(4, 'big') + lame
+    return body + bytes(MP3_FRAME_LENGTH - len(body))
+
+
+def id3v2(size):
+    return b'ID3\x03\x00\x00' + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) \
+        + bytes(size)
+
+
+def test_scan_reads_lame_tag_and_skips_id3(mp3_stream):
+    path = mp3_stream(10, prefix=id3v2(300) + info_frame(10, 576, 1000), suffix=b'TAG' + bytes(125))
+    stream = verify.scan_mp3(path)
+    assert stream == verify.Mp3Stream(sample_rate=44100, samples_per_frame=1152, frames=10, header_frames=10,
+                                      delay=576, padding=1000, truncated=False, junk=0)
+
+
+def test_scan_counts_junk_and_a_cut_off_frame(mp3_stream):
+    frame = MP3_HEADER + bytes(MP3_FRAME_LENGTH - len(MP3_HEADER))
+    path = mp3_stream(5, suffix=b'junk' + frame * 2 + frame[:100])
+    stream = verify.scan_mp3(path)
+    assert (stream.frames, stream.junk, stream.truncated, stream.header_frames) == (7, 4, True, None)
+
+
+def test_verify_reports_length_and_frame_count_mismatches(mp3_stream):
+    path = mp3_stream(10, prefix=info_frame(12, 576, 1000))
+    assert tags.write_mp3_tags(path, {})
+    track = manifest.TrackInfo(path=Path('track.flac'), rel_path=Path('track.flac'), size=0,
+                               sample_rate=44100, total_samples=10 * 1152 - 576 - 1000)
+    assert verify.verify_mp3(track, path, None) == ["10 frames, Xing header says 12"]
+
+    # Gapless length may be off by one sample, no more
+    track.total_samples += 1
+    assert len(verify.verify_mp3(track, path, None)) == 1
+    track.total_samples += 1
+    assert "of audio, source is" in verify.verify_mp3(track, path, None)[1]